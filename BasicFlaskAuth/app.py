@@ -1,5 +1,9 @@
 from flask import Flask, request, abort
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 from jose import jwt
 from urllib.request import urlopen
@@ -12,6 +16,10 @@ ALGORITHMS = ['RS256']
 API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
 
 
+# Tokens kept in the verified-token cache at most.
+TOKEN_CACHE_SIZE = 1024
+
+
 class AuthError(Exception):
     def __init__(self, error, status_code):
         self.error = error
@@ -51,7 +59,51 @@ def get_token_auth_header():
     return token
 
 
+class VerifiedTokenCache:
+    """Payloads of already verified tokens, keyed by a hash of the token.
+
+    Entries expire at the token's exp claim; the least recently used entry
+    is dropped once the cache is full.
+    """
+
+    def __init__(self, max_entries=TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, token, payload):
+        if not isinstance(payload.get('exp'), (int, float)):
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._entries[key] = (payload['exp'], payload)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+verified_tokens = VerifiedTokenCache()
+
+
 def verify_decode_jwt(token):
+    """Verifies the token's signature and claims, skipping the RS256 check
+    for tokens that were verified before and have not expired.
+    """
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload
+
     jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
     jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
@@ -81,6 +133,7 @@ def verify_decode_jwt(token):
                 issuer='https://' + AUTH0_DOMAIN + '/'
             )
 
+            verified_tokens.set(token, payload)
             return payload
 
         except jwt.ExpiredSignatureError:
@@ -1,19 +1,42 @@
 # ----------------------------------------------------------------------------#
 # Imports
 # ----------------------------------------------------------------------------#
+import hmac
+import os
 import sys
 import json
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+import click
+from flask import (
+    Flask,
+    render_template,
+    request,
+    Response,
+    flash,
+    redirect,
+    url_for,
+    abort,
+    jsonify,
+    stream_with_context,
+)
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate, MigrateCommand
+from sqlalchemy import and_, case, func, tuple_
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
+import search
+import cache
+import importer
+import dbpool
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -24,6 +47,7 @@ moment = Moment(app)
 app.config.from_object("config")
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+page_cache = cache.PageCache(app)
 
 # TODO: connect to a local postgresql database
 
@@ -32,8 +56,39 @@ migrate = Migrate(app, db)
 # ----------------------------------------------------------------------------#
 
 
+venue_genre = db.Table(
+    "venue_genre",
+    db.Column("venue_id", db.Integer, db.ForeignKey("venue.id"), primary_key=True),
+    db.Column("genre_id", db.Integer, db.ForeignKey("genre.id"), primary_key=True),
+    db.Index("ix_venue_genre_genre_id_venue_id", "genre_id", "venue_id"),
+)
+
+artist_genre = db.Table(
+    "artist_genre",
+    db.Column("artist_id", db.Integer, db.ForeignKey("artist.id"), primary_key=True),
+    db.Column("genre_id", db.Integer, db.ForeignKey("genre.id"), primary_key=True),
+    db.Index("ix_artist_genre_genre_id_artist_id", "genre_id", "artist_id"),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = "genre"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
 class Venue(db.Model):
     __tablename__ = "venue"
+    __table_args__ = (
+        db.Index("ix_venue_city_state_name", "city", "state", "name"),
+        db.Index(
+            "ix_venue_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -41,58 +96,414 @@ class Venue(db.Model):
     state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(120), nullable=False)
     website = db.Column(db.String(120), nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120), nullable=False)
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(300), nullable=False)
+    genres = db.relationship(
+        "Genre", secondary=venue_genre, order_by="Genre.name", lazy=True
+    )
     shows = db.relationship("Show", cascade="all,delete", backref="venue", lazy=True)
 
 
 class Artist(db.Model):
     __tablename__ = "artist"
+    __table_args__ = (
+        db.Index("ix_artist_name", "name"),
+        db.Index(
+            "ix_artist_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(120), nullable=False)
     website = db.Column(db.String(120), nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
     facebook_link = db.Column(db.String(120), nullable=False)
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(300), nullable=False)
+    genres = db.relationship(
+        "Genre", secondary=artist_genre, order_by="Genre.name", lazy=True
+    )
     shows = db.relationship("Show", cascade="all,delete", backref="artist", lazy=True)
 
 
 class Show(db.Model):
     __tablename__ = "show"
+    __table_args__ = (
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time"),
+        db.Index("ix_show_start_time_id", "start_time", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey("artist.id"), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey("venue.id"), nullable=False)
 
 
+class ImportCheckpoint(db.Model):
+    __tablename__ = "import_checkpoint"
+
+    source = db.Column(db.String(500), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+search.install(Venue)
+search.install(Artist)
+
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+
+def upcoming_cutoff():
+    # Shows that started less than three hours ago still count as upcoming.
+    return datetime.now() - timedelta(hours=3)
+
+
+def genres_by_name(names):
+    """Genre rows for ``names``, creating the ones that do not exist yet."""
+    genres = Genre.query.filter(Genre.name.in_(names)).all()
+    known = {genre.name for genre in genres}
+    genres.extend(Genre(name=name) for name in names if name not in known)
+    return genres
+
+
+def with_genres(query, id_column, owner_column, genres):
+    """Restrict ``query`` to rows tagged with any of ``genres``.
+
+    Resolves through the unique genre name index and the (genre_id, owner_id)
+    index on the association table instead of scanning the owners.
+    """
+    if not genres:
+        return query
+    tagged = (
+        db.session.query(owner_column)
+        .join(Genre, Genre.id == owner_column.table.c.genre_id)
+        .filter(Genre.name.in_(genres))
+    )
+    return query.filter(id_column.in_(tagged))
+
+
+def venue_areas(cutoff=None, genres=None):
+    """Venues grouped by (city, state) with their upcoming show counts.
+
+    Runs a single grouped query regardless of how many areas exist; rows
+    arrive sorted by city, state and name so they can be grouped in order.
+    """
+    if cutoff is None:
+        cutoff = upcoming_cutoff()
+
+    query = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, func.count(Show.id)
+    ).outerjoin(Show, and_(Show.venue_id == Venue.id, Show.start_time > cutoff))
+    rows = (
+        with_genres(query, Venue.id, venue_genre.c.venue_id, genres)
+        .group_by(Venue.city, Venue.state, Venue.name, Venue.id)
+        .order_by(Venue.city, Venue.state, Venue.name, Venue.id)
+        .all()
+    )
+
+    areas = []
+    for (city, state), records in groupby(rows, key=itemgetter(2, 3)):
+        venue_data = [
+            {"id": record[0], "name": record[1], "num_upcoming_shows": record[4]}
+            for record in records
+        ]
+        areas.append({"city": city, "state": state, "venues": venue_data})
+
+    return areas
+
+
+def encode_show_cursor(start_time, show_id):
+    return f"{start_time.isoformat()},{show_id}"
+
+
+def decode_show_cursor(value):
+    start_time, _, show_id = value.rpartition(",")
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+class ShowPage:
+    """A keyset page of shows, newest first, read lazily from the database.
+
+    Rows are fetched through a server-side cursor and turned into template
+    dicts one at a time, so memory stays bounded by the page size. Once the
+    page has been iterated, ``next_cursor`` points at the following page.
+    """
+
+    def __init__(self, query, per_page):
+        self.query = query
+        self.per_page = per_page
+        self.next_cursor = None
+
+    def __iter__(self):
+        last = None
+        rows = self.query.execution_options(stream_results=True).yield_per(
+            min(self.per_page, 500)
+        )
+        for count, row in enumerate(rows, 1):
+            if count > self.per_page:
+                self.next_cursor = encode_show_cursor(last.start_time, last.id)
+                break
+            last = row
+            yield {
+                "venue_id": row.venue_id,
+                "venue_name": row.venue_name,
+                "artist_id": row.artist_id,
+                "artist_name": row.artist_name,
+                "artist_image_link": row.artist_image_link,
+                "start_time": row.start_time,
+            }
+
+
+def show_page(cursor=None, per_page=100):
+    """Shows ordered by (start_time, id) descending, starting after ``cursor``."""
+    query = (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Venue.id.label("venue_id"),
+            Venue.name.label("venue_name"),
+            Artist.id.label("artist_id"),
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Artist, Show.artist_id == Artist.id)
+        .join(Venue, Show.venue_id == Venue.id)
+    )
+    if cursor is not None:
+        query = query.filter(tuple_(Show.start_time, Show.id) < cursor)
+    # One extra row tells us whether another page follows.
+    query = query.order_by(Show.start_time.desc(), Show.id.desc()).limit(
+        per_page + 1
+    )
+
+    return ShowPage(query, per_page)
+
+
+def show_counts(owner_column, owner_id, cutoff):
+    """(past, upcoming) show counts for one venue or artist in one query."""
+    upcoming = func.coalesce(
+        func.sum(case([(Show.start_time > cutoff, 1)], else_=0)), 0
+    )
+    total, upcoming = (
+        db.session.query(func.count(Show.id), upcoming)
+        .filter(owner_column == owner_id)
+        .one()
+    )
+    return total - upcoming, upcoming
+
+
+def show_slice(owner_column, owner_id, partner, cutoff, upcoming, limit, cursor=None):
+    """A bounded, ordered slice of one side of a venue's or artist's shows.
+
+    Upcoming shows come soonest first; past shows come most recent first and
+    can be paged with a keyset ``cursor``. Returns the template dicts and the
+    cursor of the next page, or None when the slice is the last one.
+    """
+    prefix = partner.__tablename__
+    query = (
+        db.session.query(
+            Show.id, Show.start_time, partner.id, partner.name, partner.image_link
+        )
+        .join(partner)
+        .filter(owner_column == owner_id)
+    )
+    if upcoming:
+        query = query.filter(Show.start_time > cutoff).order_by(
+            Show.start_time, Show.id
+        )
+    else:
+        query = query.filter(Show.start_time <= cutoff)
+        if cursor is not None:
+            query = query.filter(tuple_(Show.start_time, Show.id) < cursor)
+        query = query.order_by(Show.start_time.desc(), Show.id.desc())
+    records = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        last = records[-1]
+        next_cursor = encode_show_cursor(last[1], last[0])
+
+    data = [
+        {
+            f"{prefix}_id": record[2],
+            f"{prefix}_name": record[3],
+            f"{prefix}_image_link": record[4],
+            "start_time": record[1],
+        }
+        for record in records
+    ]
+    return data, next_cursor
+
+
+def split_shows(owner_column, owner_id, partner):
+    """Counts plus the first upcoming and past slices for a detail page.
+
+    The past/upcoming cutoff is computed once and both the counts and the
+    slices are resolved by the database, so the cost of a detail page does
+    not grow with the length of its show history.
+    """
+    cutoff = upcoming_cutoff()
+    past_count, upcoming_count = show_counts(owner_column, owner_id, cutoff)
+    upcoming_data, _ = show_slice(
+        owner_column,
+        owner_id,
+        partner,
+        cutoff,
+        upcoming=True,
+        limit=app.config["UPCOMING_SHOWS_LIMIT"],
+    )
+    past_data, past_cursor = show_slice(
+        owner_column,
+        owner_id,
+        partner,
+        cutoff,
+        upcoming=False,
+        limit=app.config["PAST_SHOWS_PER_PAGE"],
+    )
+    return {
+        "past_shows": past_data,
+        "upcoming_shows": upcoming_data,
+        "past_shows_count": past_count,
+        "upcoming_shows_count": upcoming_count,
+        "past_shows_cursor": past_cursor,
+    }
+
+
+def show_partners(owner_column, owner_id, partner_column):
+    """Ids of the venues or artists sharing a show with one artist or venue."""
+    rows = (
+        db.session.query(partner_column)
+        .filter(owner_column == owner_id)
+        .distinct()
+        .all()
+    )
+    return [row[0] for row in rows]
+
+
+def invalidate_venue(venue_id, artist_ids=()):
+    page_cache.invalidate(
+        "venues",
+        "shows",
+        f"venue:{venue_id}",
+        *(f"artist:{artist_id}" for artist_id in artist_ids),
+    )
+
+
+def invalidate_artist(artist_id, venue_ids=()):
+    page_cache.invalidate(
+        "artists",
+        "shows",
+        f"artist:{artist_id}",
+        *(f"venue:{venue_id}" for venue_id in venue_ids),
+    )
+
+
+def search_results(model, search_term):
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = app.config["SEARCH_PER_PAGE"]
+    result = search.search(
+        db.session, model, search_term, per_page, (page - 1) * per_page
+    )
+    data = [{"id": id, "name": name} for id, name in result.rows]
+    return {"count": result.count, "data": data}
+
+
+def search_suggestions(model, prefix):
+    result = search.search(
+        db.session, model, prefix, app.config["SEARCH_SUGGESTIONS"]
+    )
+    return {"count": result.count, "data": [name for _, name in result.rows]}
+
+
+def past_shows_fragment(owner_column, owner_id, partner, endpoint, **view_args):
+    after = request.args.get("after")
+    try:
+        cursor = decode_show_cursor(after) if after else None
+    except ValueError:
+        abort(400)
+
+    shows, next_cursor = show_slice(
+        owner_column,
+        owner_id,
+        partner,
+        upcoming_cutoff(),
+        upcoming=False,
+        limit=app.config["PAST_SHOWS_PER_PAGE"],
+        cursor=cursor,
+    )
+    next_url = None
+    if next_cursor:
+        next_url = url_for(endpoint, after=next_cursor, **view_args)
+
+    return render_template(
+        "pages/past_shows.html",
+        shows=shows,
+        partner=partner.__tablename__,
+        next_url=next_url,
+    )
+
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+
+DEFAULT_LOCALE = babel.dates.LC_TIME or "en_US_POSIX"
+
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=None)
+def babel_locale(locale):
+    return babel.Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value, format, locale):
+    # Show times repeat a lot (same slots, same page re-rendered), so the
+    # formatted strings are memoized on top of the compiled patterns.
+    return datetime_pattern(format).apply(value, babel_locale(locale))
+
+
+def format_datetime(value, format="medium", locale=DEFAULT_LOCALE):
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return _format_datetime(value, format, locale)
 
 
 app.jinja_env.filters["datetime"] = format_datetime
 
+
+def stream_template(template_name, **context):
+    # Flask 1.x has no stream_template; this mirrors its streaming pattern.
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(5)
+    return stream
+
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
@@ -108,85 +519,41 @@ def index():
 
 
 @app.route("/venues")
+@page_cache.cached(lambda: ("venues",))
 def venues():
-    
-    areas = []
-
-    query = Venue.query.distinct("city", "state").all()
-
-    for item in query:
-
-        venues_query = (
-            Venue.query.filter_by(city=item.city, state=item.state)
-            .order_by(Venue.name)
-            .all()
-        )
-        venue_data = []
-        for item in venues_query:
-            data = {"id": item.id, "name": item.name, "num_upcoming_shows": 0}
-            venue_data.append(data)
-
-        area = {"city": item.city, "state": item.state, "venues": venue_data}
-        areas.append(area)
-
+    areas = venue_areas(genres=request.args.getlist("genre"))
 
     return render_template("pages/venues.html", areas=areas)
 
 
 @app.route("/venues/search", methods=["POST"])
 def search_venues():
-
-    response = {}
     search_term = request.form.get("search_term", "")
- 
-    query = Venue.query.filter(Venue.name.ilike(f"%{search_term}%"))
-    venues_count = query.count()
-    venues = query.order_by(Venue.name).all()
-
-    data = []
-    for venue in venues:
-        data.append({"id": venue.id, "name": venue.name})
-
-    response = {"count": venues_count, "data": data}
+    results = search_results(Venue, search_term)
 
     return render_template(
-        "pages/search_venues.html", results=response, search_term=search_term,
+        "pages/search_venues.html", results=results, search_term=search_term,
     )
 
 
+@app.route("/venues/suggest")
+def suggest_venues():
+    return jsonify(search_suggestions(Venue, request.args.get("q", "")))
+
+
 @app.route("/venues/<int:venue_id>")
+@page_cache.cached(lambda venue_id: (f"venue:{venue_id}",))
 def show_venue(venue_id):
-    data = []
-
     venue = Venue.query.get(venue_id)
-    records = (
-        db.session.query(Show, Artist)
-        .join(Artist)
-        .filter(Show.venue_id == venue_id)
-        .all()
-    )
-
-    past_data = []
-    upcoming_data = []
-    for record in records:
-
-        d = {
-            "artist_id": record[1].id,
-            "artist_name": record[1].name,
-            "artist_image_link": record[1].image_link,
-            "start_time": record[0].start_time.strftime("%m/%d/%Y, %H:%M:%S"),
-        }
+    if venue is None:
+        abort(404)
 
-        cutoff_time = datetime.now() - timedelta(hours=3)
-        if record[0].start_time <= cutoff_time:
-            past_data.append(d)
-        else:
-            upcoming_data.append(d)
+    shows = split_shows(Show.venue_id, venue_id, Artist)
 
     data = {
         "id": venue.id,
         "name": venue.name,
-        "genres": venue.genres.split(","),
+        "genres": [genre.name for genre in venue.genres],
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -196,15 +563,27 @@ def show_venue(venue_id):
         "seeking_talent": venue.seeking_talent,
         "seeking_description": venue.seeking_description,
         "image_link": venue.image_link,
-        "past_shows": past_data,
-        "upcoming_shows": upcoming_data,
-        "past_shows_count": len(past_data),
-        "upcoming_shows_count": len(upcoming_data),
+        "past_shows": shows["past_shows"],
+        "upcoming_shows": shows["upcoming_shows"],
+        "past_shows_count": shows["past_shows_count"],
+        "upcoming_shows_count": shows["upcoming_shows_count"],
+        "past_shows_next": shows["past_shows_cursor"]
+        and url_for(
+            "venue_past_shows", venue_id=venue.id, after=shows["past_shows_cursor"]
+        ),
     }
 
     return render_template("pages/show_venue.html", venue=data)
 
 
+@app.route("/venues/<int:venue_id>/past_shows")
+@page_cache.cached(lambda venue_id: (f"venue:{venue_id}",))
+def venue_past_shows(venue_id):
+    return past_shows_fragment(
+        Show.venue_id, venue_id, Artist, "venue_past_shows", venue_id=venue_id
+    )
+
+
 @app.route("/venues/create", methods=["GET"])
 def create_venue_form():
     form = VenueForm(request.form)
@@ -218,14 +597,13 @@ def create_venue_submission():
     if request.method == "POST" and form.validate():
 
         try:
-            genres = str(form.genres.data).strip("[]").replace("'", "").replace(" ", "")
             venue = Venue(
                 name=form.name.data,
                 city=form.city.data,
                 state=form.state.data,
                 address=form.address.data,
                 phone=form.phone.data,
-                genres=genres,
+                genres=genres_by_name(form.genres.data),
                 website=form.website.data,
                 image_link=form.image_link.data,
                 facebook_link=form.facebook_link.data,
@@ -234,6 +612,7 @@ def create_venue_submission():
             )
             db.session.add(venue)
             db.session.commit()
+            page_cache.invalidate("venues")
             flash("Venue " + request.form["name"] + " was successfully listed!")
         except:
             flash(
@@ -265,6 +644,7 @@ def edit_venue_submission(venue_id):
         form.state.data = venue.state
         form.address.data = venue.address
         form.phone.data = venue.phone
+        form.genres.data = [genre.name for genre in venue.genres]
         form.website.data = venue.website
         form.image_link.data = venue.image_link
         form.facebook_link.data = venue.facebook_link
@@ -277,14 +657,13 @@ def edit_venue_submission(venue_id):
 
         try:
             venue = Venue.query.get(venue_id)
-            genres = str(form.genres.data).strip("[]").replace("'", "").replace(" ", "")
 
             venue.name = form.name.data
             venue.city = form.city.data
             venue.state = form.state.data
             venue.address = form.address.data
             venue.phone = form.phone.data
-            venue.genres = genres
+            venue.genres = genres_by_name(form.genres.data)
             venue.website = form.website.data
             venue.image_link = form.image_link.data
             venue.facebook_link = form.facebook_link.data
@@ -292,6 +671,9 @@ def edit_venue_submission(venue_id):
             venue.seeking_description = form.seeking_description.data
 
             db.session.commit()
+            invalidate_venue(
+                venue_id, show_partners(Show.venue_id, venue_id, Show.artist_id)
+            )
             flash("Venue " + form.name.data + " was successfully edited.")
         except:
             flash(
@@ -315,9 +697,11 @@ def delete_venue(venue_id):
         # show_query = Show.query.filter_by(venue_id=venue_id)
         try:
             venue = db.session.query(Venue).filter_by(id=venue_id).first()
+            artist_ids = show_partners(Show.venue_id, venue.id, Show.artist_id)
             db.session.delete(venue)
 
             db.session.commit()
+            invalidate_venue(venue.id, artist_ids)
             flash("Venue deleted")
         except:
             db.session.rollback()
@@ -336,9 +720,13 @@ def delete_venue(venue_id):
 
 
 @app.route("/artists")
+@page_cache.cached(lambda: ("artists",))
 def artists():
-
-    artists = Artist.query.order_by(Artist.name).all()
+    query = db.session.query(Artist.id, Artist.name)
+    query = with_genres(
+        query, Artist.id, artist_genre.c.artist_id, request.args.getlist("genre")
+    )
+    artists = query.order_by(Artist.name).all()
 
     artist_data = []
     for artist in artists:
@@ -348,63 +736,38 @@ def artists():
             "name": artist.name,
         }
         artist_data.append(data)
-    
+
     return render_template("pages/artists.html", artists=artist_data)
 
 
 @app.route("/artists/search", methods=["POST"])
 def search_artists():
-    response = {}
-
     search_term = request.form.get("search_term", "")
-
-    query = Artist.query.filter(Artist.name.ilike(f"%{search_term}%"))
-    artists_count = query.count()
-    artists = query.order_by(Artist.name).all()
-    data = []
-    for artist in artists:
-        data.append({"id": artist.id, "name": artist.name})
-    response = {"count": artists_count, "data": data}
+    results = search_results(Artist, search_term)
 
     return render_template(
-        "pages/search_artists.html", results=response, search_term=search_term,
+        "pages/search_artists.html", results=results, search_term=search_term,
     )
 
 
-@app.route("/artists/<int:artist_id>")
-def show_artist(artist_id):
+@app.route("/artists/suggest")
+def suggest_artists():
+    return jsonify(search_suggestions(Artist, request.args.get("q", "")))
 
-    data = {}
 
+@app.route("/artists/<int:artist_id>")
+@page_cache.cached(lambda artist_id: (f"artist:{artist_id}",))
+def show_artist(artist_id):
     artist = Artist.query.get(artist_id)
-    records = (
-        db.session.query(Show, Venue)
-        .join(Venue)
-        .filter(Show.artist_id == artist_id)
-        .all()
-    )
-
-    past_data = []
-    upcoming_data = []
-    for record in records:
-
-        d = {
-            "venue_id": record[1].id,
-            "venue_name": record[1].name,
-            "venue_image_link": record[1].image_link,
-            "start_time": record[0].start_time.strftime("%m/%d/%Y, %H:%M:%S"),
-        }
+    if artist is None:
+        abort(404)
 
-        cutoff_time = datetime.now() - timedelta(hours=3)
-        if record[0].start_time <= cutoff_time:
-            past_data.append(d)
-        else:
-            upcoming_data.append(d)
+    shows = split_shows(Show.artist_id, artist_id, Venue)
 
     data = {
         "id": artist.id,
         "name": artist.name,
-        "genres": artist.genres.split(","),
+        "genres": [genre.name for genre in artist.genres],
         "city": artist.city,
         "state": artist.state,
         "phone": artist.phone,
@@ -413,15 +776,29 @@ def show_artist(artist_id):
         "seeking_venue": artist.seeking_venue,
         "seeking_description": artist.seeking_description,
         "image_link": artist.image_link,
-        "past_shows": past_data,
-        "upcoming_shows": upcoming_data,
-        "past_shows_count": len(past_data),
-        "upcoming_shows_count": len(upcoming_data),
+        "past_shows": shows["past_shows"],
+        "upcoming_shows": shows["upcoming_shows"],
+        "past_shows_count": shows["past_shows_count"],
+        "upcoming_shows_count": shows["upcoming_shows_count"],
+        "past_shows_next": shows["past_shows_cursor"]
+        and url_for(
+            "artist_past_shows",
+            artist_id=artist.id,
+            after=shows["past_shows_cursor"],
+        ),
     }
 
     return render_template("pages/show_artist.html", artist=data)
 
 
+@app.route("/artists/<int:artist_id>/past_shows")
+@page_cache.cached(lambda artist_id: (f"artist:{artist_id}",))
+def artist_past_shows(artist_id):
+    return past_shows_fragment(
+        Show.artist_id, artist_id, Venue, "artist_past_shows", artist_id=artist_id
+    )
+
+
 @app.route("/artists/create", methods=["GET"])
 def create_artist_form():
     form = ArtistForm()
@@ -434,15 +811,12 @@ def create_artist_submission():
     form = ArtistForm(request.form)
     if form.validate():
         try:
-            genres = (str(form.genres.data).strip("[]")
-                      .replace("'", "").replace(" ", ""))
-
             artist = Artist(
                 name=form.name.data,
                 city=form.city.data,
                 state=form.state.data,
                 phone=form.phone.data,
-                genres=genres,
+                genres=genres_by_name(form.genres.data),
                 website=form.website.data,
                 image_link=form.image_link.data,
                 facebook_link=form.facebook_link.data,
@@ -451,6 +825,7 @@ def create_artist_submission():
             )
             db.session.add(artist)
             db.session.commit()
+            page_cache.invalidate("artists")
             flash("Artist " + request.form["name"] + " was successfully listed!")
         except:
             flash(
@@ -485,6 +860,7 @@ def edit_artist_submission(artist_id):
         form.city.data = artist.city
         form.state.data = artist.state
         form.phone.data = artist.phone
+        form.genres.data = [genre.name for genre in artist.genres]
         form.website.data = artist.website
         form.image_link.data = artist.image_link
         form.facebook_link.data = artist.facebook_link
@@ -498,13 +874,12 @@ def edit_artist_submission(artist_id):
 
         try:
             artist = Artist.query.get(artist_id)
-            genres = str(form.genres.data).strip("[]").replace("'", "").replace(" ", "")
 
             artist.name = form.name.data
             artist.city = form.city.data
             artist.state = form.state.data
             artist.phone = form.phone.data
-            artist.genres = genres
+            artist.genres = genres_by_name(form.genres.data)
             artist.website = form.website.data
             artist.image_link = form.image_link.data
             artist.facebook_link = form.facebook_link.data
@@ -512,6 +887,9 @@ def edit_artist_submission(artist_id):
             artist.seeking_description = form.seeking_description.data
 
             db.session.commit()
+            invalidate_artist(
+                artist_id, show_partners(Show.artist_id, artist_id, Show.venue_id)
+            )
             flash("Artist " + form.name.data + " was successfully edited.")
         except:
             flash(
@@ -534,8 +912,13 @@ def delete_artist(artist_id):
     if query.count() == 1:
         try:
             artist = db.session.query(Artist).filter_by(id=artist_id).first()
+            venue_ids = show_partners(Show.artist_id, artist.id, Show.venue_id)
             db.session.delete(artist)
             db.session.commit()
+            invalidate_artist(artist.id, venue_ids)
+            # Its shows were deleted with it, which changes the upcoming show
+            # counts on the venue listing.
+            page_cache.invalidate("venues")
             flash("Artist deleted")
         except:
             db.session.rollback()
@@ -554,26 +937,23 @@ def delete_artist(artist_id):
 
 
 @app.route("/shows")
+@page_cache.cached(lambda: ("shows",))
 def shows():
-    shows_data = []
-   
-    query = db.session.query(Show, Artist, Venue).join(Artist).join(Venue)
-    records = query.order_by(Show.start_time.desc()).all()
-
-    for record in records:
-
-        data1 = {
-            "venue_id": record[2].id,
-            "venue_name": record[2].name,
-            "artist_id": record[1].id,
-            "artist_name": record[1].name,
-            "artist_image_link": record[1].image_link,
-            "start_time": record[0].start_time.strftime("%m/%d/%Y, %H:%M:%S"),
-        }
-
-        shows_data.append(data1)
-
-    return render_template("pages/shows.html", shows=shows_data)
+    per_page = request.args.get("per_page", app.config["SHOWS_PER_PAGE"], type=int)
+    per_page = max(1, min(per_page, app.config["SHOWS_MAX_PER_PAGE"]))
+    after = request.args.get("after")
+    try:
+        cursor = decode_show_cursor(after) if after else None
+    except ValueError:
+        abort(400)
+
+    page = show_page(cursor, per_page)
+
+    return Response(
+        stream_with_context(
+            stream_template("pages/shows.html", shows=page, page=page)
+        )
+    )
 
 
 @app.route("/shows/create")
@@ -596,6 +976,12 @@ def create_show_submission():
             )
             db.session.add(show)
             db.session.commit()
+            page_cache.invalidate(
+                "shows",
+                "venues",
+                f"venue:{show.venue_id}",
+                f"artist:{show.artist_id}",
+            )
             flash("Show was successfully listed!")
         except:
             flash("An error occurred. Show could not be listed.")
@@ -610,6 +996,188 @@ def create_show_submission():
     return render_template("pages/home.html")
 
 
+#  Bulk import
+#  ----------------------------------------------------------------
+
+
+def load_venues(rows):
+    genres = {genre.name: genre for genre in genres_by_name(import_genres(rows))}
+    db.session.add_all(
+        Venue(genres=[genres[name] for name in data.pop("genres")], **data)
+        for _, data in rows
+    )
+    return []
+
+
+def load_artists(rows):
+    genres = {genre.name: genre for genre in genres_by_name(import_genres(rows))}
+    db.session.add_all(
+        Artist(genres=[genres[name] for name in data.pop("genres")], **data)
+        for _, data in rows
+    )
+    return []
+
+
+def import_genres(rows):
+    return sorted({name for _, data in rows for name in data["genres"]})
+
+
+def load_shows(rows):
+    # Resolve every foreign key in the chunk with one query per table.
+    artist_ids = {int(data["artist_id"]) for _, data in rows}
+    venue_ids = {int(data["venue_id"]) for _, data in rows}
+    known_artists = {
+        row[0] for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))
+    }
+    known_venues = {
+        row[0] for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))
+    }
+
+    rejected = []
+    shows = []
+    for row_number, data in rows:
+        errors = {}
+        if int(data["artist_id"]) not in known_artists:
+            errors["artist_id"] = ["Artist does not exist."]
+        if int(data["venue_id"]) not in known_venues:
+            errors["venue_id"] = ["Venue does not exist."]
+        if errors:
+            rejected.append(importer.RowError(row_number, errors))
+            continue
+        shows.append(
+            {
+                "artist_id": int(data["artist_id"]),
+                "venue_id": int(data["venue_id"]),
+                "start_time": data["start_time"],
+            }
+        )
+
+    if shows:
+        db.session.execute(Show.__table__.insert(), shows)
+    return rejected
+
+
+IMPORTS = {
+    "venues": (VenueForm, load_venues),
+    "artists": (ArtistForm, load_artists),
+    "shows": (ShowForm, load_shows),
+}
+
+
+def import_job(kind, source, chunk_size, progress=None):
+    form_class, loader = IMPORTS[kind]
+    return importer.ImportJob(
+        db.session,
+        ImportCheckpoint,
+        source,
+        kind,
+        form_class,
+        loader,
+        chunk_size=chunk_size,
+        progress=progress,
+    )
+
+
+def import_format(filename):
+    return "csv" if filename.lower().endswith(".csv") else "json"
+
+
+@app.cli.command("import-data")
+@click.argument("kind", type=click.Choice(sorted(IMPORTS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--chunk-size", default=1000, show_default=True, type=click.IntRange(min=1)
+)
+@click.option("--restart", is_flag=True, help="Ignore any saved checkpoint.")
+@click.option(
+    "--import-id",
+    help="Resume by this id instead of by the file's content hash.",
+)
+def import_data_command(kind, path, chunk_size, restart, import_id):
+    """Import venues, artists or shows from a CSV or JSON file."""
+
+    def progress(report):
+        click.echo(
+            f"{kind}: {report.skipped + report.processed} rows "
+            f"({report.imported} imported, {len(report.errors)} failed, "
+            f"{report.rate:.0f} rows/s)"
+        )
+
+    with open(path, "rb") as stream:
+        source = f"id:{import_id}" if import_id else importer.content_key(stream)
+        job = import_job(kind, source, chunk_size, progress)
+        if restart:
+            job.reset()
+        report = job.run(importer.read_rows(stream, import_format(path)))
+    # Only a shared (Redis) cache reaches the running server from here; the
+    # memory backend belongs to this process and the server's copy expires
+    # after CACHE_TTL.
+    page_cache.clear()
+    if app.config.get("CACHE_BACKEND", "memory") == "memory":
+        click.echo(
+            "Note: the server's in-memory page cache is not cleared by the CLI; "
+            "imported rows appear once cached pages expire "
+            f"(within {app.config.get('CACHE_TTL', 60)}s).",
+            err=True,
+        )
+
+    for error in report.errors:
+        click.echo(f"row {error.row}: {error.errors}", err=True)
+    click.echo(
+        f"Done: {report.imported} imported, {len(report.errors)} failed, "
+        f"{report.skipped} already imported."
+    )
+
+
+@app.route("/admin/import/<kind>", methods=["POST"])
+def import_data(kind):
+    # The import writes straight to the database, so the endpoint only
+    # exists once IMPORT_TOKEN is configured, and callers must send it.
+    token = app.config.get("IMPORT_TOKEN")
+    if not token or kind not in IMPORTS:
+        abort(404)
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        abort(401)
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        abort(400)
+
+    def progress(report):
+        app.logger.info(
+            "import %s: %d rows, %d failed",
+            kind,
+            report.skipped + report.processed,
+            len(report.errors),
+        )
+
+    chunk_size = request.form.get("chunk_size", 1000, type=int)
+    if chunk_size < 1:
+        abort(400)
+    import_id = request.form.get("import_id")
+    if import_id:
+        source = f"id:{import_id}"
+    else:
+        source = importer.content_key(upload.stream)
+    job = import_job(kind, source, chunk_size, progress)
+    if request.form.get("restart"):
+        job.reset()
+    report = job.run(importer.read_rows(upload.stream, import_format(upload.filename)))
+    page_cache.clear()
+
+    return jsonify(report.to_dict())
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(dbpool.metrics_text(db.engine), mimetype="text/plain")
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template("errors/404.html"), 404
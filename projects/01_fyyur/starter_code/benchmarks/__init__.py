@@ -0,0 +1,111 @@
+"""Shared helpers for the Fyyur benchmarks.
+
+Run a benchmark from the project root, e.g. ``python -m benchmarks.venues``.
+Set ``BENCH_DATABASE_URL`` to benchmark against PostgreSQL; by default an
+in-memory SQLite database is used.
+"""
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+import dbpool
+from app import app, db, page_cache, Venue, Artist, Show, Genre
+
+BENCH_DATABASE_URL = os.environ.get("BENCH_DATABASE_URL", "sqlite://")
+
+app.config["SQLALCHEMY_DATABASE_URI"] = BENCH_DATABASE_URL
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dbpool.engine_options(BENCH_DATABASE_URL)
+
+
+def reset_db():
+    page_cache.clear()
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def seed(n_areas, venues_per_area=3, artists=20, shows_per_venue=4):
+    """Populate the database with ``n_areas`` cities of venues and shows."""
+    now = datetime.now()
+    jazz = Genre(name="Jazz")
+    folk = Genre(name="Folk")
+    rock = Genre(name="Rock n Roll")
+
+    artist_rows = [
+        Artist(
+            name=f"Artist {i}",
+            city="Somewhere",
+            state="CA",
+            phone="555-555-5555",
+            genres=[jazz, rock] if i % 2 else [rock],
+            website="https://example.com",
+            image_link="https://example.com/artist.png",
+            facebook_link="https://facebook.com/artist",
+            seeking_venue=False,
+            seeking_description="",
+        )
+        for i in range(artists)
+    ]
+    db.session.add_all(artist_rows)
+    db.session.flush()
+
+    for area in range(n_areas):
+        for i in range(venues_per_area):
+            venue = Venue(
+                name=f"Venue {area}-{i}",
+                city=f"City {area}",
+                state="CA",
+                address=f"{i} Main St",
+                phone="555-555-5555",
+                genres=[jazz, folk] if area % 2 else [folk],
+                website="https://example.com",
+                image_link="https://example.com/venue.png",
+                facebook_link="https://facebook.com/venue",
+                seeking_talent=False,
+                seeking_description="",
+            )
+            db.session.add(venue)
+            db.session.flush()
+            for j in range(shows_per_venue):
+                offset = timedelta(days=j - shows_per_venue // 2)
+                db.session.add(
+                    Show(
+                        artist_id=artist_rows[(area + j) % artists].id,
+                        venue_id=venue.id,
+                        start_time=now + offset,
+                    )
+                )
+
+    db.session.commit()
+
+
+@contextmanager
+def count_queries():
+    """Yield a list that collects every statement executed inside the block.
+
+    Each entry is a ``(statement, parameters)`` pair as sent to the DBAPI.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def timed(fn, repeat=5):
+    """Best-of-``repeat`` wall time of ``fn()`` in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
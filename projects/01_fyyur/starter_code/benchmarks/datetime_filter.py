@@ -0,0 +1,59 @@
+"""Cost of the ``datetime`` template filter over a 5k-row shows page.
+
+    python -m benchmarks.datetime_filter
+
+Compares the previous path (strftime in the view, then dateutil parsing and
+babel.dates.format_datetime in the filter) with format_datetime applied to
+datetime objects directly.
+"""
+import sys
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime, _format_datetime
+from benchmarks import timed
+
+ROWS = 5000
+
+
+def legacy_format_datetime(value, format="medium"):
+    date = dateutil.parser.parse(value)
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def main():
+    start = datetime(2020, 5, 1, 20, 0)
+    # Shows land on a limited set of evening slots, as on a real listing.
+    values = [start + timedelta(days=i % 365, hours=i % 4) for i in range(ROWS)]
+
+    def legacy():
+        for value in values:
+            legacy_format_datetime(value.strftime("%m/%d/%Y, %H:%M:%S"), "full")
+
+    def cold():
+        _format_datetime.cache_clear()
+        for value in values:
+            format_datetime(value, "full")
+
+    def warm():
+        for value in values:
+            format_datetime(value, "full")
+
+    for value in values[:50]:
+        expected = legacy_format_datetime(value.strftime("%m/%d/%Y, %H:%M:%S"), "full")
+        assert format_datetime(value, "full") == expected
+
+    print(f"{'path':>8} {'ms / 5k rows':>14}")
+    for name, fn in (("legacy", legacy), ("cold", cold), ("warm", warm)):
+        print(f"{name:>8} {timed(fn):>14.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
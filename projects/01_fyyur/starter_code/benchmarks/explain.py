@@ -0,0 +1,98 @@
+"""Fail if a hot-path query falls back to a sequential scan.
+
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.explain
+
+Each page is requested against a seeded database while its statements are
+captured, then every captured statement is run through EXPLAIN. On
+PostgreSQL sequential scans are disabled for the check, so a "Seq Scan" in a
+plan means no usable index exists. Search relies on pg_trgm and is only
+checked on PostgreSQL.
+"""
+import re
+import sys
+
+from app import app, db
+from benchmarks import count_queries, reset_db, seed
+
+# (method, url, form data, PostgreSQL only)
+HOT_PATHS = (
+    ("GET", "/venues", None, False),
+    ("GET", "/venues?genre=Jazz", None, False),
+    ("GET", "/artists", None, False),
+    ("GET", "/artists?genre=Jazz", None, False),
+    ("GET", "/shows", None, False),
+    ("GET", "/venues/1", None, False),
+    ("GET", "/artists/1", None, False),
+    ("POST", "/venues/search", {"search_term": "enue 1"}, True),
+    ("POST", "/artists/search", {"search_term": "tist 1"}, True),
+)
+
+# Lookup tables small enough that scanning them is always the right plan.
+SMALL_TABLES = {"genre"}
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?!.*\bUSING\b)(?:TABLE )?(\w+)")
+
+
+def explain(connection, statement, parameters):
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in rows]
+    rows = connection.execute("EXPLAIN " + statement, parameters)
+    return [row[0] for row in rows]
+
+
+def full_scans(dialect, plan):
+    scans = []
+    for line in plan:
+        if dialect == "sqlite":
+            match = SQLITE_FULL_SCAN.match(line.strip())
+            if match and match.group(1) not in SMALL_TABLES:
+                scans.append(match.group(1))
+        else:
+            match = re.search(r"Seq Scan on (\w+)", line)
+            if match and match.group(1) not in SMALL_TABLES:
+                scans.append(line.strip())
+    return scans
+
+
+def main():
+    failures = []
+    client = app.test_client()
+
+    with app.app_context():
+        reset_db()
+        seed(200, shows_per_venue=10)
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            db.session.execute("ANALYZE")
+            db.session.commit()
+
+        for method, url, data, postgresql_only in HOT_PATHS:
+            if postgresql_only and dialect != "postgresql":
+                print(f"skip {method} {url} (needs PostgreSQL)")
+                continue
+
+            with count_queries() as statements:
+                response = client.open(url, method=method, data=data)
+                response.get_data()
+            assert response.status_code == 200, (url, response.status_code)
+
+            with db.engine.connect() as connection:
+                if dialect == "postgresql":
+                    connection.execute("SET enable_seqscan = off")
+                for statement, parameters in statements:
+                    plan = explain(connection, statement, parameters)
+                    scans = full_scans(dialect, plan)
+                    status = "FAIL" if scans else "ok"
+                    print(f"{status:>4} {method} {url}: {' '.join(statement.split())[:80]}")
+                    if scans:
+                        failures.append((url, statement, plan))
+
+    for url, statement, plan in failures:
+        print(f"\n{url}\n{statement}")
+        print("\n".join(plan))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""Query count and latency of the /venues listing as the number of areas grows.
+
+    python -m benchmarks.venues
+"""
+import sys
+
+from app import app, venue_areas
+from benchmarks import count_queries, reset_db, seed, timed
+
+AREA_COUNTS = (10, 100, 1000)
+
+
+def main():
+    query_counts = []
+    with app.app_context():
+        print(f"{'areas':>8} {'queries':>8} {'ms':>10}")
+        for n_areas in AREA_COUNTS:
+            reset_db()
+            seed(n_areas)
+
+            with count_queries() as statements:
+                areas = venue_areas()
+            assert len(areas) == n_areas
+
+            elapsed = timed(venue_areas)
+            query_counts.append(len(statements))
+            print(f"{n_areas:>8} {len(statements):>8} {elapsed:>10.2f}")
+
+    if len(set(query_counts)) != 1:
+        print("FAIL: query count grows with the number of areas")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Rendered page cache with tag-based invalidation.
+
+``PageCache.cached(tags)`` wraps a GET view and stores its rendered body
+under the request's path and query string. Every entry is labelled with
+tags such as ``"venues"`` or ``"venue:4"``; write handlers call
+``PageCache.invalidate(*tags)`` for exactly the pages they affect. Entries
+also expire after a TTL, since the past/upcoming split moves with the clock.
+
+Two storage backends share the ``get``/``set``/``invalidate`` interface:
+``MemoryBackend`` (an in-process LRU) and ``RedisBackend``, which talks to
+any Redis-compatible server and needs the optional ``redis`` package.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request, session
+
+try:
+    import redis
+except ImportError:  # only needed for CACHE_BACKEND = "redis"
+    redis = None
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value, _ = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags):
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _drop(self, key):
+        # Called with the lock held. Every way an entry leaves the cache
+        # goes through here, so the tag index never outgrows the entries.
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+class RedisBackend:
+    def __init__(self, url, ttl=60, prefix="fyyur:page:"):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.hmget(self.prefix + key, "mimetype", "body")
+        if value[1] is None:
+            return None
+        return value[0].decode(), value[1]
+
+    def set(self, key, value, tags):
+        mimetype, body = value
+        pipe = self.client.pipeline()
+        pipe.hset(self.prefix + key, mapping={"mimetype": mimetype, "body": body})
+        pipe.expire(self.prefix + key, self.ttl)
+        for tag in tags:
+            pipe.sadd(self.prefix + "tag:" + tag, key)
+            pipe.expire(self.prefix + "tag:" + tag, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            keys = self.client.smembers(tag_key)
+            pipe = self.client.pipeline()
+            for key in keys:
+                pipe.delete(self.prefix + key.decode())
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        ttl = app.config.get("CACHE_TTL", 60)
+        if app.config.get("CACHE_BACKEND") == "redis":
+            self.backend = RedisBackend(app.config["CACHE_REDIS_URL"], ttl=ttl)
+        elif app.config.get("CACHE_BACKEND", "memory") == "memory":
+            self.backend = MemoryBackend(
+                max_entries=app.config.get("CACHE_MAX_ENTRIES", 1024), ttl=ttl
+            )
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        self._count("invalidations")
+        self.backend.invalidate(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def cached(self, tags):
+        """Cache a view's 200 responses; ``tags(**view_args)`` labels them."""
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**view_args):
+                # Pending flash messages are rendered into the page, so those
+                # responses are neither served from nor written to the cache.
+                if self.backend is None or session.get("_flashes"):
+                    return view(**view_args)
+
+                key = request.full_path
+                value = self.backend.get(key)
+                if value is not None:
+                    self._count("hits")
+                    mimetype, body = value
+                    return Response(body, mimetype=mimetype)
+
+                self._count("misses")
+                response = view(**view_args)
+                if isinstance(response, str):
+                    response = Response(response)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+
+                entry_tags = tags(**view_args)
+                if response.is_streamed:
+                    response.response = self._store_stream(
+                        key, response.mimetype, response.response, entry_tags
+                    )
+                else:
+                    value = (response.mimetype, response.get_data())
+                    self.backend.set(key, value, entry_tags)
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def _store_stream(self, key, mimetype, chunks, tags):
+        # Pass chunks through as they are produced and store the page only
+        # once the stream has completed.
+        body = []
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            body.append(chunk)
+            yield chunk
+        self.backend.set(key, (mimetype, b"".join(body)), tags)
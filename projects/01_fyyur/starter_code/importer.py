@@ -0,0 +1,200 @@
+"""Chunked, resumable bulk import of venues, artists and shows.
+
+Rows are streamed from CSV or JSON (an array or one object per line),
+validated with the same WTForms classes the create pages use, and handed
+to a loader in chunks. Each chunk is committed together with a checkpoint
+row recording how many input rows of the source have been processed, so
+re-running an interrupted import of the same content (or the same
+explicit import id) skips straight to the first uncommitted row. Rows that fail validation or reference missing records are reported
+with their row number and skipped.
+"""
+import csv
+import hashlib
+import io
+import json
+import time
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+
+RowError = namedtuple("RowError", ["row", "errors"])
+
+
+class ImportReport:
+    def __init__(self, kind, skipped=0):
+        self.kind = kind
+        self.skipped = skipped
+        self.processed = 0
+        self.imported = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.processed / elapsed if elapsed else 0.0
+
+    def to_dict(self, max_errors=1000):
+        return {
+            "kind": self.kind,
+            "skipped": self.skipped,
+            "processed": self.processed,
+            "imported": self.imported,
+            "failed": len(self.errors),
+            "rows_per_second": round(self.rate, 1),
+            "errors": [error._asdict() for error in self.errors[:max_errors]],
+        }
+
+
+def content_key(stream, block_size=1024 * 1024):
+    """Checkpoint key for the contents of a seekable binary ``stream``.
+
+    The stream is rewound afterwards. Keying by content means a different
+    file uploaded under the same name starts its own import instead of
+    resuming, and skipping rows of, another one.
+    """
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(block_size), b""):
+        digest.update(block)
+    stream.seek(0)
+    return "sha256:" + digest.hexdigest()
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per input row from a binary ``stream``."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        for row in csv.DictReader(text):
+            # Multi-valued fields such as genres are comma separated.
+            if row.get("genres"):
+                row["genres"] = [g.strip() for g in row["genres"].split(",")]
+            yield row
+    else:
+        yield from _read_json(text)
+
+
+def _read_json(text, block_size=64 * 1024):
+    # Decodes a JSON array or JSON Lines one object at a time, so the whole
+    # document never has to be held in memory.
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,[]")
+        if not buffer:
+            if eof:
+                return
+            block = text.read(block_size)
+            eof = not block
+            buffer += block
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            block = text.read(block_size)
+            eof = not block
+            buffer += block
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+def validate(form_class, row):
+    """Validate ``row`` with ``form_class``; returns (data, errors)."""
+    items = []
+    for key, value in row.items():
+        if isinstance(value, list):
+            items.extend((key, str(item)) for item in value)
+        elif value is not None:
+            items.append((key, str(value)))
+    form = form_class(formdata=MultiDict(items), meta={"csrf": False})
+    if form.validate():
+        return form.data, None
+    return None, form.errors
+
+
+class ImportJob:
+    """Run one import of ``kind`` from ``source`` through ``loader``.
+
+    ``loader(valid_rows)`` receives ``(row_number, data)`` pairs for one chunk,
+    adds them to the session and returns a list of ``RowError`` for rows it
+    had to reject (for example unknown foreign keys).
+    """
+
+    def __init__(
+        self,
+        session,
+        checkpoint_model,
+        source,
+        kind,
+        form_class,
+        loader,
+        chunk_size=1000,
+        progress=None,
+    ):
+        self.session = session
+        self.checkpoint_model = checkpoint_model
+        self.source = source
+        self.kind = kind
+        self.form_class = form_class
+        self.loader = loader
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def checkpoint(self):
+        checkpoint = self.session.query(self.checkpoint_model).get(
+            (self.source, self.kind)
+        )
+        if checkpoint is None:
+            checkpoint = self.checkpoint_model(
+                source=self.source, kind=self.kind, rows_done=0
+            )
+            self.session.add(checkpoint)
+        return checkpoint
+
+    def reset(self):
+        self.checkpoint().rows_done = 0
+        self.session.commit()
+
+    def run(self, rows):
+        checkpoint = self.checkpoint()
+        done = checkpoint.rows_done
+        report = ImportReport(self.kind, skipped=done)
+        rows = islice(rows, done, None)
+        row_number = done
+
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+
+            valid = []
+            for row in chunk:
+                row_number += 1
+                data, errors = validate(self.form_class, row)
+                if errors:
+                    report.errors.append(RowError(row_number, errors))
+                else:
+                    valid.append((row_number, data))
+
+            try:
+                rejected = self.loader(valid)
+                checkpoint = self.checkpoint()
+                checkpoint.rows_done = row_number
+                checkpoint.updated_at = datetime.utcnow()
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                raise
+
+            report.errors.extend(rejected)
+            report.processed += len(chunk)
+            report.imported += len(valid) - len(rejected)
+            if self.progress is not None:
+                self.progress(report)
+
+        return report
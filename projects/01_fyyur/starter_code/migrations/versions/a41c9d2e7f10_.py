@@ -0,0 +1,40 @@
+"""add indexes for hot lookup columns
+
+Revision ID: a41c9d2e7f10
+Revises: 78b819ee0b81
+Create Date: 2020-04-14 09:12:31.504118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41c9d2e7f10'
+down_revision = '78b819ee0b81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm lets the GIN indexes serve case-insensitive ILIKE '%term%'.
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_venue_city_state_name', 'venue', ['city', 'state', 'name'], unique=False)
+    op.create_index('ix_artist_name', 'artist', ['name'], unique=False)
+    op.create_index('ix_venue_name_trgm', 'venue', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'artist', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_trgm', table_name='artist')
+    op.drop_index('ix_venue_name_trgm', table_name='venue')
+    op.drop_index('ix_artist_name', table_name='artist')
+    op.drop_index('ix_venue_city_state_name', table_name='venue')
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
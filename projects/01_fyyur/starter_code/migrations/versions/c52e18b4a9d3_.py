@@ -0,0 +1,37 @@
+"""add full-text search indexes for venue and artist
+
+Revision ID: c52e18b4a9d3
+Revises: a41c9d2e7f10
+Create Date: 2020-04-15 17:40:02.118436
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52e18b4a9d3'
+down_revision = 'a41c9d2e7f10'
+branch_labels = None
+depends_on = None
+
+# Must stay identical to search.POSTGRES_DOCUMENT so the planner can use it.
+DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || "
+    "coalesce(state, '')), 'B') || "
+    "setweight(to_tsvector('simple', replace(coalesce(genres, ''), ',', ' ')), 'C')"
+)
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.execute(
+            f'CREATE INDEX IF NOT EXISTS ix_{table}_search '
+            f'ON {table} USING gin (({DOCUMENT}))'
+        )
+
+
+def downgrade():
+    op.drop_index('ix_artist_search', table_name='artist')
+    op.drop_index('ix_venue_search', table_name='venue')
@@ -0,0 +1,103 @@
+"""normalize venue and artist genres into genre tables
+
+Revision ID: e7b3f0a61c28
+Revises: c52e18b4a9d3
+Create Date: 2020-04-18 11:03:54.270991
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3f0a61c28'
+down_revision = 'c52e18b4a9d3'
+branch_labels = None
+depends_on = None
+
+# The choices offered by VenueForm/ArtistForm at the time of this revision.
+# Rows were stored with spaces stripped ("RocknRoll"), so existing values are
+# matched against these names with their spaces removed.
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+OLD_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || "
+    "coalesce(state, '')), 'B') || "
+    "setweight(to_tsvector('simple', replace(coalesce(genres, ''), ',', ' ')), 'C')"
+)
+
+# Must stay identical to search.POSTGRES_DOCUMENT so the planner can use it.
+DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || "
+    "coalesce(state, '')), 'B')"
+)
+
+
+def upgrade():
+    genre = op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table in ('venue', 'artist'):
+        op.create_table(f'{table}_genre',
+        sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+        sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ),
+        sa.PrimaryKeyConstraint(f'{table}_id', 'genre_id')
+        )
+        op.create_index(f'ix_{table}_genre_genre_id_{table}_id', f'{table}_genre',
+                        ['genre_id', f'{table}_id'], unique=False)
+
+    op.bulk_insert(genre, [{'name': name} for name in GENRES])
+
+    for table in ('venue', 'artist'):
+        # Keep any stored genre that is no longer one of the form choices.
+        op.execute(f"""
+            INSERT INTO genre (name)
+            SELECT DISTINCT trim(t.name)
+            FROM {table} CROSS JOIN LATERAL
+                unnest(string_to_array({table}.genres, ',')) AS t(name)
+            WHERE trim(t.name) <> ''
+              AND NOT EXISTS (
+                  SELECT 1 FROM genre
+                  WHERE replace(genre.name, ' ', '') = trim(t.name))
+        """)
+        op.execute(f"""
+            INSERT INTO {table}_genre ({table}_id, genre_id)
+            SELECT DISTINCT {table}.id, genre.id
+            FROM {table} CROSS JOIN LATERAL
+                unnest(string_to_array({table}.genres, ',')) AS t(name)
+            JOIN genre ON replace(genre.name, ' ', '') = trim(t.name)
+        """)
+        op.drop_index(f'ix_{table}_search', table_name=table)
+        op.drop_column(table, 'genres')
+        op.execute(f'CREATE INDEX ix_{table}_search ON {table} USING gin (({DOCUMENT}))')
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.add_column(table, sa.Column('genres', sa.String(length=120), nullable=True))
+        op.execute(f"""
+            UPDATE {table} SET genres = coalesce((
+                SELECT string_agg(replace(genre.name, ' ', ''), ',' ORDER BY genre.name)
+                FROM {table}_genre JOIN genre ON genre.id = {table}_genre.genre_id
+                WHERE {table}_genre.{table}_id = {table}.id), '')
+        """)
+        op.alter_column(table, 'genres',
+                   existing_type=sa.String(length=120),
+                   nullable=False)
+        op.drop_index(f'ix_{table}_search', table_name=table)
+        op.execute(f'CREATE INDEX ix_{table}_search ON {table} USING gin (({OLD_DOCUMENT}))')
+        op.drop_index(f'ix_{table}_genre_genre_id_{table}_id', table_name=f'{table}_genre')
+        op.drop_table(f'{table}_genre')
+    op.drop_table('genre')
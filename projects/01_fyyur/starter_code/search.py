@@ -0,0 +1,207 @@
+"""Ranked venue and artist search.
+
+Two backends share one interface, ``backend.search(session, model, term,
+limit, offset)``, which returns the total match count and one page of
+``(id, name)`` rows from a single query:
+
+* ``PostgresSearch`` matches a weighted ``tsvector`` over name, city and
+  state (served by a GIN expression index) and falls back to a ``pg_trgm``
+  indexed ``ILIKE`` on the name so partial words still match. Each kind of
+  match is its own indexed query and their ids are combined with UNION; an
+  OR across them would keep the planner from using the indexes.
+* ``SQLiteSearch`` does the same with an FTS5 table kept in sync by triggers,
+  so search can be exercised locally without PostgreSQL.
+
+Every search term is matched as a prefix, which makes the same call usable
+for search-as-you-type. A term that prefixes a genre name also matches
+everything tagged with that genre, resolved through the ``<table>_genre``
+association index.
+"""
+import re
+from collections import namedtuple
+
+from sqlalchemy import DDL, event, text
+
+SearchResult = namedtuple("SearchResult", ["count", "rows"])
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Must stay identical to the index expression in migration e7b3f0a61c28.
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || "
+    "coalesce(state, '')), 'B')"
+)
+
+
+def tokens(term):
+    return TOKEN.findall(term.lower())
+
+
+def escape_like(term):
+    """``term`` with the LIKE wildcards escaped, for use with ESCAPE '\\'."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def genre_ids(table):
+    """SQL query: ids of ``table`` rows carrying a genre starting with :genre."""
+    return (
+        f"SELECT owner.{table}_id FROM {table}_genre AS owner "
+        "JOIN genre ON genre.id = owner.genre_id "
+        "WHERE lower(genre.name) LIKE :genre ESCAPE '\\'"
+    )
+
+
+def like_params(term):
+    return {
+        "pattern": f"%{escape_like(term)}%",
+        "genre": f"{escape_like(term.lower())}%",
+    }
+
+
+class PostgresSearch:
+    def install(self, table):
+        event.listen(
+            table,
+            "after_create",
+            DDL(
+                f"CREATE INDEX IF NOT EXISTS ix_{table.name}_search "
+                f"ON {table.name} USING gin (({POSTGRES_DOCUMENT}))"
+            ).execute_if(dialect="postgresql"),
+        )
+
+    def search(self, session, model, term, limit, offset):
+        table = model.__tablename__
+        words = tokens(term)
+        if not words:
+            return _all_rows(session, table, limit, offset)
+
+        statement = text(
+            f"""
+            WITH matched AS (
+                SELECT id FROM {table}
+                WHERE ({POSTGRES_DOCUMENT}) @@ to_tsquery('simple', :query)
+                UNION
+                SELECT id FROM {table} WHERE name ILIKE :pattern ESCAPE '\\'
+                UNION
+                {genre_ids(table)}
+            )
+            SELECT {table}.id, {table}.name, count(*) OVER () AS total
+            FROM matched JOIN {table} ON {table}.id = matched.id,
+                to_tsquery('simple', :query) AS query
+            ORDER BY ts_rank({POSTGRES_DOCUMENT}, query)
+                + similarity({table}.name, :term) DESC, {table}.name
+            LIMIT :limit OFFSET :offset
+            """
+        )
+        return _run(
+            session,
+            statement,
+            {
+                "query": " & ".join(f"{word}:*" for word in words),
+                "term": term,
+                "limit": limit,
+                "offset": offset,
+                **like_params(term),
+            },
+        )
+
+
+class SQLiteSearch:
+    def install(self, table):
+        name = table.name
+        columns = "name, city, state"
+        new_values = "new.id, new.name, new.city, new.state"
+        old_values = "old.id, old.name, old.city, old.state"
+        delete = (
+            f"INSERT INTO {name}_fts({name}_fts, rowid, {columns}) "
+            f"VALUES ('delete', {old_values});"
+        )
+        insert = f"INSERT INTO {name}_fts(rowid, {columns}) VALUES ({new_values});"
+
+        statements = (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {name}_fts USING fts5("
+            f"{columns}, content='{name}', content_rowid='id')",
+            f"CREATE TRIGGER IF NOT EXISTS {name}_fts_ai AFTER INSERT ON {name} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {name}_fts_ad AFTER DELETE ON {name} "
+            f"BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {name}_fts_au AFTER UPDATE ON {name} "
+            f"BEGIN {delete} {insert} END",
+        )
+        for statement in statements:
+            event.listen(
+                table, "after_create", DDL(statement).execute_if(dialect="sqlite")
+            )
+        # The FTS index points at rowids of the table; drop it alongside.
+        event.listen(
+            table,
+            "before_drop",
+            DDL(f"DROP TABLE IF EXISTS {name}_fts").execute_if(dialect="sqlite"),
+        )
+
+    def search(self, session, model, term, limit, offset):
+        table = model.__tablename__
+        words = tokens(term)
+        if not words:
+            return _all_rows(session, table, limit, offset)
+
+        statement = text(
+            f"""
+            SELECT {table}.id, {table}.name, count(*) OVER () AS total
+            FROM {table}
+            LEFT JOIN (
+                SELECT rowid AS id, bm25({table}_fts, 10.0, 2.0, 2.0) AS rank
+                FROM {table}_fts WHERE {table}_fts MATCH :query
+            ) AS matches ON matches.id = {table}.id
+            WHERE matches.id IS NOT NULL
+                OR {table}.name LIKE :pattern ESCAPE '\\'
+                OR {table}.id IN ({genre_ids(table)})
+            ORDER BY matches.rank IS NULL, matches.rank, {table}.name
+            LIMIT :limit OFFSET :offset
+            """
+        )
+        return _run(
+            session,
+            statement,
+            {
+                "query": " ".join(f'"{word}"*' for word in words),
+                "limit": limit,
+                "offset": offset,
+                **like_params(term),
+            },
+        )
+
+
+def _all_rows(session, table, limit, offset):
+    statement = text(
+        f"SELECT id, name, count(*) OVER () AS total FROM {table} "
+        "ORDER BY name LIMIT :limit OFFSET :offset"
+    )
+    return _run(session, statement, {"limit": limit, "offset": offset})
+
+
+def _run(session, statement, params):
+    rows = session.execute(statement, params).fetchall()
+    if rows:
+        return SearchResult(rows[0].total, [(row.id, row.name) for row in rows])
+    if not params["offset"]:
+        return SearchResult(0, [])
+    # Past the last page there is no row to carry the total; read it from
+    # the first row instead.
+    first = session.execute(statement, dict(params, limit=1, offset=0)).first()
+    return SearchResult(first.total if first else 0, [])
+
+
+BACKENDS = {"postgresql": PostgresSearch(), "sqlite": SQLiteSearch()}
+
+
+def install(model):
+    """Attach the DDL every backend needs to ``model``'s table."""
+    for backend in BACKENDS.values():
+        backend.install(model.__table__)
+
+
+def search(session, model, term, limit, offset=0):
+    backend = BACKENDS[session.get_bind().dialect.name]
+    return backend.search(session, model, term.strip(), limit, offset)
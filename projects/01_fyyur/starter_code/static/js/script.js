@@ -2,3 +2,24 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// "Load more" for paged fragments: swap the button for the next page.
+document.addEventListener('click', function (event) {
+  var button = event.target.closest('.load-more button[data-url]');
+  if (!button) {
+    return;
+  }
+  button.disabled = true;
+  fetch(button.getAttribute('data-url'))
+    .then(function (response) {
+      return response.text();
+    })
+    .then(function (html) {
+      var wrapper = button.parentNode;
+      wrapper.insertAdjacentHTML('beforebegin', html);
+      wrapper.parentNode.removeChild(wrapper);
+    })
+    .catch(function () {
+      button.disabled = false;
+    });
+});
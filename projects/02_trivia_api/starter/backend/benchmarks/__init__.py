@@ -0,0 +1,56 @@
+"""Shared helpers for the trivia API benchmarks.
+
+Run a benchmark from the backend directory, e.g. ``python -m benchmarks.quizzes``.
+Set ``BENCH_DATABASE_URL`` to benchmark against PostgreSQL; by default an
+in-memory SQLite database is used.
+"""
+import os
+import time
+
+from flaskr import create_app
+from models import db, Question, Category
+
+BENCH_DATABASE_URL = os.environ.get("BENCH_DATABASE_URL", "sqlite://")
+
+CATEGORIES = ("Science", "Art", "Geography", "History", "Entertainment", "Sports")
+
+
+def make_app(**config):
+    return create_app(dict(config, DATABASE_PATH=BENCH_DATABASE_URL))
+
+
+def reset_db():
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def seed(n_questions, batch_size=10000):
+    """Populate the categories and ``n_questions`` questions spread over them."""
+    db.session.add_all(Category(type=name) for name in CATEGORIES)
+    db.session.commit()
+
+    for start in range(0, n_questions, batch_size):
+        stop = min(start + batch_size, n_questions)
+        db.session.bulk_insert_mappings(Question, [
+            {
+                "question": f"Question {i}?",
+                "question_key": f"question {i}",
+                "answer": f"Answer {i}",
+                "category": i % len(CATEGORIES) + 1,
+                "difficulty": i % 5 + 1,
+            }
+            for i in range(start, stop)
+        ])
+        db.session.commit()
+
+
+def timed(fn, repeat=5):
+    """Best-of-``repeat`` wall time of ``fn()`` in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
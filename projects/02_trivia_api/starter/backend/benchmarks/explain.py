@@ -0,0 +1,75 @@
+"""Fail if a hot-path query scans the questions table.
+
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.explain
+
+Each endpoint is requested against a seeded database while its statements
+are captured, then every captured statement is run through EXPLAIN. On
+PostgreSQL sequential scans are disabled for the check, so a "Seq Scan on
+questions" means no usable index exists.
+"""
+import re
+import sys
+
+from sqlalchemy import event
+
+from benchmarks import make_app, reset_db, seed
+from models import db
+
+# (method, url, JSON body)
+HOT_PATHS = (
+    ("GET", "/categories/3/questions", None),
+    ("GET", "/categories/3/questions?page=50", None),
+    ("GET", "/questions?after=5000", None),
+    ("POST", "/quizzes", {"quiz_category": 3, "previous_questions": [3]}),
+)
+
+FULL_SCAN = {
+    "sqlite": re.compile(r"^SCAN (?:TABLE )?questions$"),
+    "postgresql": re.compile(r"Seq Scan on questions\b"),
+}
+
+
+def main():
+    app = make_app()
+    client = app.test_client()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    with app.app_context():
+        reset_db()
+        seed(20000)
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            db.session.execute("ANALYZE")
+            db.session.commit()
+
+        event.listen(db.engine, "before_cursor_execute", capture)
+        for method, url, body in HOT_PATHS:
+            response = client.open(url, method=method, json=body)
+            assert response.status_code == 200, (url, response.status_code)
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+        failed = False
+        with db.engine.connect() as connection:
+            if dialect == "sqlite":
+                prefix, column = "EXPLAIN QUERY PLAN ", -1
+            else:
+                connection.execute("SET enable_seqscan = off")
+                prefix, column = "EXPLAIN ", 0
+            for statement, parameters in statements:
+                plan = [row[column] for row in
+                        connection.execute(prefix + statement, parameters)]
+                scans = any(FULL_SCAN[dialect].search(line.strip())
+                            for line in plan)
+                failed = failed or scans
+                print(f"{'FAIL' if scans else 'ok':>4} "
+                      f"{' '.join(statement.split())[:80]}")
+                print("\n".join(f"       {line}" for line in plan))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
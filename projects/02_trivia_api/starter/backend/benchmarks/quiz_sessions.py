@@ -0,0 +1,76 @@
+"""Per-question cost of a long quiz: previous_questions vs a quiz session.
+
+    python -m benchmarks.quiz_sessions
+
+Plays the same category to the end both ways. With POST /quizzes the
+client resends every answered id, so late questions cost more than early
+ones; with a session each question should cost the same.
+"""
+import sys
+import time
+
+from benchmarks import make_app, reset_db, seed
+
+QUESTIONS = 30000
+CATEGORY = 3
+
+
+def play(next_question):
+    """Milliseconds spent on each question until the quiz runs out."""
+    costs = []
+    previous = []
+    while True:
+        start = time.perf_counter()
+        question = next_question(previous)
+        costs.append((time.perf_counter() - start) * 1000)
+        if question is None:
+            return costs
+        previous.append(question["id"])
+
+
+def summary(costs, window=100):
+    first = sum(costs[:window]) / window
+    last = sum(costs[-window:]) / window
+    return first, last
+
+
+def main():
+    app = make_app()
+    client = app.test_client()
+
+    def legacy(previous):
+        response = client.post("/quizzes", json={
+            "quiz_category": CATEGORY,
+            "previous_questions": previous,
+        })
+        return response.get_json()["question"]
+
+    with app.app_context():
+        reset_db()
+        seed(QUESTIONS)
+
+        session_id = client.post(
+            "/quizzes/sessions", json={"quiz_category": CATEGORY}
+        ).get_json()["session_id"]
+
+        def session(previous):
+            response = client.post(f"/quizzes/sessions/{session_id}/next")
+            return response.get_json()["question"]
+
+        print(f"{'':>10} {'questions':>10} {'first ms':>10} {'last ms':>10}")
+        legacy_costs = play(legacy)
+        print(f"{'previous':>10} {len(legacy_costs) - 1:>10}"
+              " {:>10.2f} {:>10.2f}".format(*summary(legacy_costs)))
+        session_costs = play(session)
+        first, last = summary(session_costs)
+        print(f"{'session':>10} {len(session_costs) - 1:>10}"
+              f" {first:>10.2f} {last:>10.2f}")
+
+    if last > first * 2:
+        print("FAIL: quiz session questions get slower as the quiz goes on")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Latency of POST /quizzes as the question bank grows.
+
+    python -m benchmarks.quizzes
+
+Compares the previous selection (shuffle the category with ORDER BY
+random(), load it and filter previous questions in Python) with counting
+the remaining questions and skipping to a random one through the
+(category, id) index, which reads no questions but the one it returns.
+"""
+import sys
+
+from sqlalchemy import func
+
+from benchmarks import make_app, reset_db, seed, timed
+from models import Question
+
+SIZES = (1000, 10000, 100000)
+PREVIOUS = list(range(1, 200, 3))
+
+
+def legacy_quiz():
+    questions = Question.query.filter(
+        Question.category == 3).order_by(func.random()).all()
+    new_questions = [q for q in questions if q.id not in PREVIOUS]
+    return new_questions[0].format() if new_questions else None
+
+
+def main():
+    body = {"quiz_category": 3, "previous_questions": PREVIOUS}
+    rows = []
+    print(f"{'questions':>10} {'legacy ms':>10} {'indexed ms':>10}")
+    for size in SIZES:
+        app = make_app()
+        client = app.test_client()
+
+        def quiz():
+            response = client.post("/quizzes", json=body)
+            assert response.get_json()["question"]["id"] not in PREVIOUS
+
+        with app.app_context():
+            reset_db()
+            seed(size)
+            legacy = timed(legacy_quiz)
+            indexed = timed(quiz, repeat=20)
+        rows.append(indexed)
+        print(f"{size:>10} {legacy:>10.2f} {indexed:>10.2f}")
+
+    # Allow for noise, but a 100x larger bank must not cost 10x as much.
+    if rows[-1] > rows[0] * 10:
+        print("FAIL: /quizzes latency grows with the size of the bank")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,115 @@
 import os
-from flask import Flask, request, abort, jsonify
+import click
+from flask import (Flask, Response, request, abort, jsonify, current_app,
+                   has_app_context)
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, exc
+from sqlalchemy import event, exc
+from sqlalchemy.orm import object_session
 from flask_cors import CORS
+from flask_migrate import Migrate
+import hashlib
+import json
 import math
 import random
+import threading
+import time
 
-from models import setup_db, Question, Category
+from collections import namedtuple
 
-QUESTIONS_PER_PAGE = 10
+from models import setup_db, database_path, db, Question, Category
+from dbpool import metrics_text
+from .quiz_sessions import make_store
+from . import ingest, search
+
+QUESTIONS_PER_PAGE = int(os.environ.get('QUESTIONS_PER_PAGE', 10))
+# How long the total question count and category map may be served from
+# memory before they are read again.
+CACHE_SECONDS = int(os.environ.get('TRIVIA_CACHE_SECONDS', 30))
+# Where quiz sessions are kept: 'memory' or 'redis'.
+QUIZ_SESSION_BACKEND = os.environ.get('QUIZ_SESSION_BACKEND', 'memory')
+QUIZ_SESSION_REDIS_URL = os.environ.get(
+    'QUIZ_SESSION_REDIS_URL', 'redis://localhost:6379/0')
+QUIZ_SESSION_TTL = int(os.environ.get('QUIZ_SESSION_TTL', 3600))
+# Questions inserted per transaction by bulk imports.
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+# How long browsers may reuse /categories before revalidating it.
+CATEGORIES_MAX_AGE = int(os.environ.get('CATEGORIES_MAX_AGE', 300))
+
+Categories = namedtuple('Categories', ['types', 'etag'])
+
+
+class CachedValue:
+    '''
+    Holds the result of load() for ttl seconds, or until a handler that
+    changed the underlying rows calls invalidate().
+    '''
+
+    def __init__(self, load, ttl=CACHE_SECONDS):
+        self.load = load
+        self.ttl = ttl
+        self.value = None
+        self.expires = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            if time.monotonic() >= self.expires:
+                self.value = self.load()
+                self.expires = time.monotonic() + self.ttl
+            return self.value
+
+    def invalidate(self):
+        with self.lock:
+            self.expires = 0
+
+
+def load_categories():
+    types = {
+        category.id: category.type
+        for category in Category.query.order_by(Category.id)
+    }
+    # The ETag depends only on the content, so every worker agrees on it.
+    etag = hashlib.sha1(
+        json.dumps(sorted(types.items())).encode()).hexdigest()
+    return Categories(types, etag)
+
+
+# Categories change rarely and only outside the API, so rather than
+# expiring them often, drop the cache whenever a commit touched them. The
+# listeners are registered once here, not per app, and invalidate the
+# cache of the app the commit ran in.
+def category_flushed(mapper, connection, target):
+    object_session(target).info['categories_changed'] = True
+
+
+def transaction_started(session, transaction, connection):
+    session.info.pop('categories_changed', None)
+
+
+def transaction_committed(session):
+    if session.info.get('categories_changed') and has_app_context():
+        current_app.extensions['category_cache'].invalidate()
+
+
+for name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Category, name, category_flushed)
+event.listen(db.session, 'after_begin', transaction_started)
+event.listen(db.session, 'after_commit', transaction_committed)
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
-    setup_db(app)
+    app.config['QUESTIONS_PER_PAGE'] = QUESTIONS_PER_PAGE
+    app.config['QUIZ_SESSION_BACKEND'] = QUIZ_SESSION_BACKEND
+    app.config['QUIZ_SESSION_REDIS_URL'] = QUIZ_SESSION_REDIS_URL
+    app.config['QUIZ_SESSION_TTL'] = QUIZ_SESSION_TTL
+    app.config['CATEGORIES_MAX_AGE'] = CATEGORIES_MAX_AGE
+    app.config['IMPORT_CHUNK_SIZE'] = IMPORT_CHUNK_SIZE
+    if test_config is not None:
+        app.config.update(test_config)
+    setup_db(app, app.config.get('DATABASE_PATH', database_path))
+    Migrate(app, db)
     cors = CORS(app, resources={r"/api/*": {"origins": "*"}})
 
     # CORS Headers
@@ -26,36 +121,77 @@ def create_app(test_config=None):
                              'GET,PATCH,POST,DELETE,OPTIONS')
         return response
 
+    question_count = CachedValue(lambda: Question.query.count())
+    category_cache = CachedValue(load_categories)
+
+    def category_map():
+        return category_cache.get().types
+
+    # Read by transaction_committed() to drop this app's category map.
+    app.extensions['category_cache'] = category_cache
+
+    def quiz_questions(quiz_category):
+        # Quiz category 0 means ALL questions
+        if quiz_category == 0:
+            return Question.query
+        if quiz_category in category_map():
+            return Question.query.filter(Question.category == quiz_category)
+        return None
+
+    quiz_sessions = make_store(app.config)
+
+    def questions_changed():
+        question_count.invalidate()
+
     @app.route('/categories')
     def get_categories():
-        categories = Category.query.order_by(Category.id).all()
+        categories = category_cache.get()
 
-        if len(categories) == 0:
+        if len(categories.types) == 0:
             abort(404)
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'categories': {category.id: category.type for category in categories}
+            'categories': categories.types
         })
+        # Clients revalidate with If-None-Match and get a bodyless 304.
+        response.set_etag(categories.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['CATEGORIES_MAX_AGE']
+        return response.make_conditional(request)
 
     @app.route('/questions', methods=['GET'])
     def get_questions():
-        page = request.args.get('page', 1, type=int)
-        start = (page-1)*10
-        end = start + 10
-        questions = Question.query.order_by(Question.id).all()
+        per_page = app.config['QUESTIONS_PER_PAGE']
+        query = Question.query.order_by(Question.id)
+        if 'after' in request.args:
+            # Keyset mode: continue after the last id of the previous page,
+            # which costs the same however deep into the bank it is.
+            after = request.args.get('after', type=int)
+            if after is None:
+                abort(400)
+            query = query.filter(Question.id > after)
+        else:
+            page = request.args.get('page', 1, type=int)
+            if page < 1:
+                abort(404)
+            query = query.offset((page - 1) * per_page)
+        # One extra row tells us whether there is a next page.
+        questions = query.limit(per_page + 1).all()
         # Check if there are questions on selected page
-        if len(questions[start:end]) == 0:
+        if len(questions) == 0:
             abort(404)
-        formatted_questions = [question.format() for question in questions]
-        categories = Category.query.all()
+        categories = category_map()
         # Check if there are categories in db
         if len(categories) == 0:
             abort(404)
+        has_next = len(questions) > per_page
+        questions = questions[:per_page]
         return jsonify({
             'success': True,
-            'questions': formatted_questions[start:end],
-            'total_questions': len(formatted_questions),
-            'categories': {category.id: category.type for category in categories}
+            'questions': [question.format() for question in questions],
+            'total_questions': question_count.get(),
+            'categories': categories,
+            'next_cursor': questions[-1].id if has_next else None
         })
 
     @app.route('/questions', methods=["POST"])
@@ -69,6 +205,10 @@ def create_app(test_config=None):
         difficulty = data.get('difficulty', None)
         # Check if all required info is in request body
         if question and answer and category and difficulty:
+            try:
+                category = int(category)
+            except (TypeError, ValueError):
+                abort(400)
             try:
                 question = Question(question=question,
                                     answer=answer,
@@ -76,6 +216,7 @@ def create_app(test_config=None):
                                     difficulty=difficulty)
 
                 question.insert()
+                questions_changed()
                 return jsonify({
                     'success': True,
                     'created': question.id
@@ -85,24 +226,63 @@ def create_app(test_config=None):
         else:
             abort(400)
 
+    @app.route('/questions/batch', methods=["POST"])
+    def create_questions_batch():
+        # The body is JSON Lines and is read line by line as it arrives.
+        try:
+            report = ingest.ingest(
+                db.session, request.stream, category_map(),
+                chunk_size=app.config['IMPORT_CHUNK_SIZE'])
+        except exc.SQLAlchemyError:
+            abort(422)
+        finally:
+            questions_changed()
+        return jsonify(dict(report.to_dict(), success=True))
+
+    @app.cli.command('import-questions')
+    @click.argument('path', type=click.File('rb'))
+    @click.option('--chunk-size', type=int, default=None,
+                  help='Questions inserted per transaction.')
+    def import_questions(path, chunk_size):
+        """Import questions from a JSON Lines file ('-' for stdin)."""
+        def progress(report):
+            click.echo('{} processed, {} imported, {:.0f} records/s'.format(
+                report.processed, report.imported, report.rate), err=True)
+
+        report = ingest.ingest(
+            db.session, path, category_map(),
+            chunk_size=chunk_size or app.config['IMPORT_CHUNK_SIZE'],
+            progress=progress)
+        click.echo(json.dumps(report.to_dict(), indent=2))
+
     @app.route('/questions/search', methods=["POST"])
     def post_search():
+        per_page = app.config['QUESTIONS_PER_PAGE']
         page = request.args.get('page', 1, type=int)
-        start = (page-1)*10
-        end = start + 10
-        data = request.get_json()
+        if page < 1:
+            abort(404)
+        data = request.get_json() or {}
         search_term = data.get('search_term', None)
         if search_term is None:
             abort(400)
-        questions = Question.query.filter(
-            Question.question.ilike(f"%{search_term}%")).all()
+        if not isinstance(search_term, str):
+            abort(422)
+        query = Question.query
+        category = data.get('category', None)
+        if category is not None:
+            try:
+                category = int(category)
+            except (TypeError, ValueError):
+                abort(400)
+            query = query.filter(Question.category == category)
 
-        formatted_questions = [question.format() for question in questions]
+        result = search.search(query, search_term.strip(), per_page,
+                               (page - 1) * per_page)
 
         return jsonify({
             'success': True,
-            'questions': formatted_questions[start: end],
-            'total_questions': len(formatted_questions)
+            'questions': [question.format() for question in result.questions],
+            'total_questions': result.count
         })
 
     @app.route('/questions/<int:question_id>', methods=["DELETE"])
@@ -116,6 +296,7 @@ def create_app(test_config=None):
                 abort(404)
             else:
                 question.delete()
+                questions_changed()
 
                 return jsonify({
                     'success': True,
@@ -126,26 +307,25 @@ def create_app(test_config=None):
 
     @app.route('/categories/<int:category_id>/questions', methods=["GET"])
     def get_questions_by_category(category_id):
+        per_page = app.config['QUESTIONS_PER_PAGE']
         page = request.args.get('page', 1, type=int)
-        start = (page-1)*10
-        end = start + 10
-        category = Category.query.filter(
-            Category.id == category_id).one_or_none()
-        # Check if there are categories in db
-        if category is None:
+        # Check if the category exists
+        if category_id not in category_map() or page < 1:
             abort(404)
-        questions = Question.query.filter(
-            Question.category == category_id).all()
-
-        formatted_questions = [question.format() for question in questions]
+        questions = (Question.query
+                     .filter(Question.category == category_id)
+                     .order_by(Question.id)
+                     .limit(per_page).offset((page - 1) * per_page)
+                     .all())
         # Check if there are questions on selected page
-        if len(questions[start:end]) == 0:
+        if len(questions) == 0:
             abort(404)
 
         return jsonify({
             'success': True,
-            'questions': formatted_questions[start:end],
-            'total_questions': len(formatted_questions),
+            'questions': [question.format() for question in questions],
+            'total_questions': Question.query.filter(
+                Question.category == category_id).count(),
             'current_category': category_id
         })
 
@@ -158,31 +338,101 @@ def create_app(test_config=None):
         # Check if quiz category is provided
         if quiz_category is None:
             abort(400)
-        # If quiz category is 0 return ALL questions
-        if quiz_category == 0:
-            # Get questions in random order
-            questions = Question.query.order_by(func.random()).all()
-        else:
-            # Get questions in random order
-            questions = Question.query.filter(
-                Question.category == quiz_category).order_by(func.random()).all()
-        # Create question set that has no previous questions
-        new_questions = [
-            question for question in questions if question.id not in previous_questions]
-
-        # Select single question from available questions
-        if new_questions:
-            formatted_question = new_questions[0].format()
-        else:
-            formatted_question = None
+        try:
+            quiz_category = int(quiz_category)
+            excluded = {int(question_id) for question_id in previous_questions}
+        except (TypeError, ValueError):
+            abort(400)
+        query = quiz_questions(quiz_category)
+
+        question = None
+        if query is not None:
+            if excluded:
+                query = query.filter(~Question.id.in_(excluded))
+            # Counting and skipping to a random offset both walk the
+            # (category, id) index; only the drawn question is read.
+            remaining = query.count()
+            if remaining:
+                question_id = (query.with_entities(Question.id)
+                               .order_by(Question.id)
+                               .offset(random.randrange(remaining))
+                               .limit(1).scalar())
+                if question_id is not None:
+                    question = Question.query.get(question_id)
+        formatted_question = question.format() if question else None
 
-        print(formatted_question)
         return jsonify({
             'success': True,
             'question': formatted_question,
 
         })
 
+    @app.route('/quizzes/sessions', methods=["POST"])
+    def create_quiz_session():
+        data = request.get_json() or {}
+        quiz_category = data.get('quiz_category', None)
+        length = data.get('length', None)
+        # Check if quiz category is provided
+        if quiz_category is None:
+            abort(400)
+        try:
+            quiz_category = int(quiz_category)
+            if length is not None:
+                length = int(length)
+        except (TypeError, ValueError):
+            abort(400)
+        if length is not None and length < 1:
+            abort(400)
+
+        query = quiz_questions(quiz_category)
+        ids = [] if query is None else [
+            row.id for row in
+            query.with_entities(Question.id).order_by(Question.id)]
+        if length is None or length > len(ids):
+            length = len(ids)
+        # The question order is drawn once here; a quiz of a few questions
+        # only samples that many ids.
+        session_id = quiz_sessions.create(random.sample(ids, length))
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'total_questions': length
+        })
+
+    @app.route('/quizzes/sessions/<session_id>/next', methods=["POST"])
+    def next_quiz_question(session_id):
+        question = None
+        while question is None:
+            try:
+                question_id = quiz_sessions.pop(session_id)
+            except KeyError:
+                abort(404)
+            if question_id is None:
+                break
+            # Skip questions deleted since the session started.
+            question = Question.query.get(question_id)
+        formatted_question = question.format() if question else None
+
+        return jsonify({
+            'success': True,
+            'question': formatted_question
+        })
+
+    @app.route('/quizzes/sessions/<session_id>', methods=["DELETE"])
+    def delete_quiz_session(session_id):
+        try:
+            quiz_sessions.delete(session_id)
+        except KeyError:
+            abort(404)
+        return jsonify({
+            'success': True,
+            'deleted': session_id
+        })
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(metrics_text(db.engine), mimetype='text/plain')
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({
@@ -0,0 +1,136 @@
+'''
+Bulk question import.
+
+Questions are read from JSON Lines, one object per line with the same
+fields POST /questions takes. Every record is checked against the Category
+table, and records whose normalized question text is already in the bank
+(or earlier in the same import) are skipped as duplicates. Valid records
+are inserted in chunks, each chunk in its own transaction, so a large
+pack never holds one long transaction open. Duplicates are looked up per
+chunk through the index on questions.question_key, so only the chunk's
+own keys are ever held in memory. Records that fail are
+reported with their line number and skipped.
+'''
+import json
+import time
+from collections import namedtuple
+
+from models import Question, question_key
+
+RecordError = namedtuple('RecordError', ['line', 'error'])
+
+# Keys per duplicate lookup, well under SQLite's bound parameter limit.
+LOOKUP_SIZE = 500
+
+
+class IngestReport:
+    def __init__(self):
+        self.processed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.processed / elapsed if elapsed else 0.0
+
+    def to_dict(self, max_errors=1000):
+        return {
+            'processed': self.processed,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'failed': len(self.errors),
+            'records_per_second': round(self.rate, 1),
+            'errors': [error._asdict() for error in self.errors[:max_errors]]
+        }
+
+
+def validate(record, categories):
+    '''Returns (row, None) for a valid record, else (None, error).'''
+    if not isinstance(record, dict):
+        return None, 'expected a JSON object'
+    question = record.get('question')
+    answer = record.get('answer')
+    if not isinstance(question, str) or not question.strip():
+        return None, 'question is required'
+    if not isinstance(answer, str) or not answer.strip():
+        return None, 'answer is required'
+    try:
+        category = int(record.get('category'))
+        difficulty = int(record.get('difficulty'))
+    except (TypeError, ValueError):
+        return None, 'category and difficulty must be integers'
+    if category not in categories:
+        return None, 'unknown category {}'.format(category)
+    if not 1 <= difficulty <= 5:
+        return None, 'difficulty must be between 1 and 5'
+    return {
+        'question': question.strip(),
+        'question_key': question_key(question),
+        'answer': answer.strip(),
+        'category': category,
+        'difficulty': difficulty
+    }, None
+
+
+def ingest(session, lines, categories, chunk_size=1000, progress=None):
+    '''
+    Imports the JSON Lines in lines (str or bytes) into the question bank.
+    categories is the collection of valid category ids.
+    '''
+    report = IngestReport()
+    insert = Question.__table__.insert()
+    # The chunk's rows by key, which also drops repeats within the chunk.
+    rows = {}
+
+    def existing_keys():
+        keys = list(rows)
+        found = set()
+        for start in range(0, len(keys), LOOKUP_SIZE):
+            found.update(
+                key for key, in session.query(Question.question_key)
+                .filter(Question.question_key.in_(
+                    keys[start:start + LOOKUP_SIZE])))
+        return found
+
+    def flush():
+        try:
+            existing = existing_keys()
+            new_rows = [row for key, row in rows.items()
+                        if key not in existing]
+            if new_rows:
+                session.execute(insert, new_rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        report.duplicates += len(existing)
+        report.imported += len(new_rows)
+        rows.clear()
+        if progress is not None and new_rows:
+            progress(report)
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        report.processed += 1
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            report.errors.append(RecordError(line_number, str(error)))
+            continue
+        row, error = validate(record, categories)
+        if error:
+            report.errors.append(RecordError(line_number, error))
+            continue
+        if row['question_key'] in rows:
+            report.duplicates += 1
+            continue
+        rows[row['question_key']] = row
+        if len(rows) >= chunk_size:
+            flush()
+
+    flush()
+    return report
@@ -0,0 +1,108 @@
+'''
+Server-side quiz sessions.
+
+A session stores the shuffled ids of the questions left in a quiz, so the
+client only sends the session id and each next question is popped off the
+front in O(1), however long the quiz runs.
+
+Two stores share the create/pop/delete interface: MemoryStore keeps
+sessions in the process and RedisStore keeps them in any Redis compatible
+server, so several workers can serve the same quiz. RedisStore needs the
+optional redis package. Sessions expire after ttl seconds without a
+request.
+'''
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+try:
+    import redis
+except ImportError:  # only needed for QUIZ_SESSION_BACKEND = 'redis'
+    redis = None
+
+
+class MemoryStore:
+    def __init__(self, ttl=3600, max_sessions=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, question_ids):
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = (
+                time.monotonic() + self.ttl, deque(question_ids))
+            # Sessions are kept in order of last use; drop the stalest.
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def pop(self, session_id):
+        '''
+        Returns the next question id of the session, or None once every
+        question has been asked. Raises KeyError for unknown sessions.
+        '''
+        with self._lock:
+            expires, question_ids = self._sessions[session_id]
+            if expires < time.monotonic():
+                del self._sessions[session_id]
+                raise KeyError(session_id)
+            self._sessions[session_id] = (
+                time.monotonic() + self.ttl, question_ids)
+            self._sessions.move_to_end(session_id)
+            return question_ids.popleft() if question_ids else None
+
+    def delete(self, session_id):
+        with self._lock:
+            del self._sessions[session_id]
+
+
+class RedisStore:
+    def __init__(self, url, ttl=3600, prefix='trivia:quiz:'):
+        if redis is None:
+            raise RuntimeError(
+                "QUIZ_SESSION_BACKEND = 'redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _keys(self, session_id):
+        # Redis removes an emptied list, so a separate key records that the
+        # session exists.
+        key = self.prefix + session_id
+        return key, key + ':ids'
+
+    def create(self, question_ids):
+        session_id = uuid.uuid4().hex
+        key, ids_key = self._keys(session_id)
+        pipe = self.client.pipeline()
+        pipe.set(key, 1, ex=self.ttl)
+        if question_ids:
+            pipe.rpush(ids_key, *question_ids)
+            pipe.expire(ids_key, self.ttl)
+        pipe.execute()
+        return session_id
+
+    def pop(self, session_id):
+        key, ids_key = self._keys(session_id)
+        pipe = self.client.pipeline()
+        pipe.expire(key, self.ttl)
+        pipe.lpop(ids_key)
+        pipe.expire(ids_key, self.ttl)
+        exists, question_id, _ = pipe.execute()
+        if not exists:
+            raise KeyError(session_id)
+        return int(question_id) if question_id is not None else None
+
+    def delete(self, session_id):
+        if not self.client.delete(*self._keys(session_id)):
+            raise KeyError(session_id)
+
+
+def make_store(config):
+    ttl = config.get('QUIZ_SESSION_TTL', 3600)
+    if config.get('QUIZ_SESSION_BACKEND') == 'redis':
+        return RedisStore(config['QUIZ_SESSION_REDIS_URL'], ttl=ttl)
+    return MemoryStore(ttl=ttl)
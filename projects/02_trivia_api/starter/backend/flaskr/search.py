@@ -0,0 +1,81 @@
+'''
+Ranked question search.
+
+search(query, term, limit, offset) narrows a Question query to the
+questions matching term and returns their total count and one page of
+them, both from a single statement.
+
+On PostgreSQL questions are matched against a weighted tsvector over the
+question (A) and the answer (B), served by the GIN expression index from
+migration 3f1c7a9e2b54, and ranked by ts_rank. Every word is matched as a
+prefix. A pg_trgm indexed ILIKE on the question text keeps the substring
+matches full-text search misses ("title" finds "entitled"); those rank
+after full-text matches. The two matches are separate index scans whose
+ids are combined with UNION. Other databases use the substring match alone.
+'''
+import re
+from collections import namedtuple
+
+from sqlalchemy import DDL, event, func, literal_column, union
+
+from models import Question
+
+SearchResult = namedtuple('SearchResult', ['count', 'questions'])
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Must stay identical to the index expression in migration 3f1c7a9e2b54.
+DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(question, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(answer, '')), 'B')"
+)
+
+
+def install(table):
+    '''Creates the search indexes along with the table on PostgreSQL.'''
+    for statement in (
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        f'CREATE INDEX IF NOT EXISTS ix_{table.name}_search '
+        f'ON {table.name} USING gin (({DOCUMENT}))',
+        f'CREATE INDEX IF NOT EXISTS ix_{table.name}_question_trgm '
+        f'ON {table.name} USING gin (question gin_trgm_ops)',
+    ):
+        event.listen(table, 'after_create',
+                     DDL(statement).execute_if(dialect='postgresql'))
+
+
+def search(query, term, limit, offset):
+    pattern = '%{}%'.format(term.replace('\\', '\\\\')
+                            .replace('%', '\\%').replace('_', '\\_'))
+    substring = Question.question.ilike(pattern, escape='\\')
+    words = TOKEN.findall(term.lower())
+    dialect = query.session.get_bind().dialect.name
+
+    if dialect == 'postgresql' and words:
+        document = literal_column(f'({DOCUMENT})')
+        tsquery = func.to_tsquery(
+            'english', ' & '.join(f'{word}:*' for word in words))
+        # An OR across the two predicates keeps PostgreSQL from using either
+        # index, so each is matched on its own and the ids are combined.
+        matched = union(
+            query.with_entities(Question.id)
+            .filter(document.op('@@')(tsquery)).statement,
+            query.with_entities(Question.id).filter(substring).statement,
+        ).alias('matched')
+        query = query.join(matched, matched.c.id == Question.id)
+        order = (func.ts_rank(document, tsquery).desc(), Question.id)
+    else:
+        query = query.filter(substring)
+        order = (Question.id,)
+
+    rows = (query.add_columns(func.count().over().label('total'))
+            .order_by(*order).limit(limit).offset(offset).all())
+    if rows:
+        count = rows[0].total
+    else:
+        # Past the last page there is no row to carry the total.
+        count = query.count() if offset else 0
+    return SearchResult(count, [row[0] for row in rows])
+
+
+install(Question.__table__)
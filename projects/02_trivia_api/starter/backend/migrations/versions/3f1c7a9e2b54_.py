@@ -0,0 +1,39 @@
+"""add full-text search indexes for questions
+
+Revision ID: 3f1c7a9e2b54
+Revises: 
+Create Date: 2020-05-02 14:21:09.730512
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c7a9e2b54'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Must stay identical to flaskr.search.DOCUMENT so the planner can use it.
+DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(question, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(answer, '')), 'B')"
+)
+
+
+def upgrade():
+    # pg_trgm lets a GIN index serve ILIKE '%term%' on the question text.
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_questions_search '
+        f'ON questions USING gin (({DOCUMENT}))'
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_questions_question_trgm '
+        'ON questions USING gin (question gin_trgm_ops)'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_questions_question_trgm', table_name='questions')
+    op.drop_index('ix_questions_search', table_name='questions')
@@ -0,0 +1,57 @@
+"""make questions.category an indexed integer foreign key
+
+Revision ID: 7d2e4b1c9a06
+Revises: 3f1c7a9e2b54
+Create Date: 2020-05-04 10:37:52.284913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e4b1c9a06'
+down_revision = '3f1c7a9e2b54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases restored from trivia.psql already have an integer column
+    # with a foreign key; ones built by create_all have a varchar column.
+    inspector = sa.inspect(op.get_bind())
+    column = next(column for column in inspector.get_columns('questions')
+                  if column['name'] == 'category')
+    if not isinstance(column['type'], sa.Integer):
+        # Categories that no longer exist would violate the foreign key.
+        op.execute(
+            'UPDATE questions SET category = NULL '
+            'WHERE category IS NOT NULL AND category NOT IN '
+            '(SELECT CAST(id AS varchar) FROM categories)'
+        )
+        op.alter_column('questions', 'category',
+                        existing_type=sa.String(),
+                        type_=sa.Integer(),
+                        postgresql_using='category::integer')
+
+    foreign_keys = inspector.get_foreign_keys('questions')
+    if not any(key['constrained_columns'] == ['category']
+               for key in foreign_keys):
+        op.create_foreign_key('category', 'questions', 'categories',
+                              ['category'], ['id'],
+                              onupdate='CASCADE', ondelete='SET NULL')
+
+    indexes = inspector.get_indexes('questions')
+    if not any(index['name'] == 'ix_questions_category_id'
+               for index in indexes):
+        op.create_index('ix_questions_category_id', 'questions',
+                        ['category', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_questions_category_id', table_name='questions')
+    op.drop_constraint('category', 'questions', type_='foreignkey')
+    op.alter_column('questions', 'category',
+                    existing_type=sa.Integer(),
+                    type_=sa.String(),
+                    postgresql_using='category::varchar')
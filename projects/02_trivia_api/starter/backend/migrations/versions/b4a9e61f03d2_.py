@@ -0,0 +1,55 @@
+"""add an indexed normalized question key for import deduplication
+
+Revision ID: b4a9e61f03d2
+Revises: 7d2e4b1c9a06
+Create Date: 2020-05-06 09:12:40.518327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from models import question_key
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4a9e61f03d2'
+down_revision = '7d2e4b1c9a06'
+branch_labels = None
+depends_on = None
+
+questions = sa.table('questions',
+                     sa.column('id', sa.Integer),
+                     sa.column('question', sa.String),
+                     sa.column('question_key', sa.String))
+
+
+def upgrade():
+    # setup_db() runs create_all, so a database it built already has the
+    # column and the index.
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not any(column['name'] == 'question_key'
+               for column in inspector.get_columns('questions')):
+        op.add_column('questions',
+                      sa.Column('question_key', sa.String(), nullable=True))
+    # The key is computed in Python, the same way imports compute it.
+    rows = connection.execute(
+        sa.select([questions.c.id, questions.c.question])
+        .where(questions.c.question.isnot(None))
+        .where(questions.c.question_key.is_(None))).fetchall()
+    if rows:
+        connection.execute(
+            questions.update()
+            .where(questions.c.id == sa.bindparam('row_id'))
+            .values(question_key=sa.bindparam('key')),
+            [{'row_id': row.id, 'key': question_key(row.question)}
+             for row in rows])
+    if not any(index['name'] == 'ix_questions_question_key'
+               for index in inspector.get_indexes('questions')):
+        op.create_index('ix_questions_question_key', 'questions',
+                        ['question_key'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_questions_question_key', table_name='questions')
+    op.drop_column('questions', 'question_key')
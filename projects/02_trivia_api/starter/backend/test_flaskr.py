@@ -1,10 +1,14 @@
 import os
 import unittest
 import json
+import tempfile
+import uuid
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine
 
 from flaskr import create_app
 from models import setup_db, Question, Category
+from dbpool import InstrumentedQueuePool, metrics_text
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -36,6 +40,16 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(len(data["categories"]), 6)
 
+    def test_get_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+        self.assertIn('max-age', res.headers['Cache-Control'])
+
+        res = self.client().get('/categories',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
     def test_get_paginated_questions(self):
         res = self.client().get('/questions?page=2')
         data = json.loads(res.data)
@@ -50,6 +64,26 @@ class TriviaTestCase(unittest.TestCase):
         self.assertFalse(data['success'])
         self.assertEqual(data["message"], "Not Found")
 
+    def test_get_questions_after_cursor(self):
+        res = self.client().get('/questions')
+        first_page = json.loads(res.data)
+        res = self.client().get(
+            '/questions?after={}'.format(first_page['next_cursor']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertGreater(data['questions'][0]['id'],
+                           first_page['questions'][-1]['id'])
+        self.assertEqual(data['total_questions'],
+                         first_page['total_questions'])
+
+    def test_fail_get_questions_bad_cursor(self):
+        res = self.client().get('/questions?after=abc')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(data['success'])
+
     def test_post_question(self):
         res = self.client().post('/questions', json={
             "question": "Who are you?",
@@ -64,6 +98,43 @@ class TriviaTestCase(unittest.TestCase):
             Question.id == data['created']).one_or_none()
         self.assertNotEqual(question, None)
 
+    def test_post_questions_batch(self):
+        # A question no earlier run imported, so the counts are exact.
+        question = "Who painted canvas {}?".format(uuid.uuid4().hex)
+        lines = [
+            json.dumps({"question": question,
+                        "answer": "Leonardo da Vinci",
+                        "category": 2, "difficulty": 2}),
+            json.dumps({"question": question.upper().rstrip('?'),
+                        "answer": "Leonardo",
+                        "category": 2, "difficulty": 2}),
+            json.dumps({"question": "Is this a category?",
+                        "answer": "No",
+                        "category": 100, "difficulty": 1}),
+            "{not json",
+        ]
+        res = self.client().post('/questions/batch',
+                                 data='\n'.join(lines),
+                                 content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['processed'], 4)
+        self.assertEqual(data['imported'], 1)
+        self.assertEqual(data['duplicates'], 1)
+        self.assertEqual([error['line'] for error in data['errors']], [3, 4])
+
+        # Importing it again finds the stored question.
+        res = self.client().post('/questions/batch', data=lines[0],
+                                 content_type='application/x-ndjson')
+        data = json.loads(res.data)
+        self.assertEqual(data['imported'], 0)
+        self.assertEqual(data['duplicates'], 1)
+
+        with self.app.app_context():
+            Question.query.filter(Question.question == question).delete()
+            self.db.session.commit()
+
     def test_fail_post_question(self):
         res = self.client().post('/questions', json={})
         data = json.loads(res.data)
@@ -105,6 +176,26 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['total_questions'], 11)
         self.assertEqual(len(data['questions']), 1)
 
+    def test_search_answer(self):
+        res = self.client().post('/questions/search', json={
+            "search_term": "muhammad",
+        })
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], 1)
+        self.assertEqual(data['questions'][0]['answer'], "Muhammad Ali")
+
+    def test_search_category(self):
+        res = self.client().post('/questions/search', json={
+            "search_term": "the",
+            "category": 3
+        })
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['questions'])
+        for question in data['questions']:
+            self.assertEqual(int(question['category']), 3)
+
     def test_fail_search(self):
         res = self.client().post('/questions/search?page=3', json={
 
@@ -120,6 +211,8 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertEqual(data['total_questions'], 4)
         self.assertEqual(len(data['questions']), 4)
+        for question in data['questions']:
+            self.assertEqual(question['category'], 4)
 
     def test_fail_get_categories_questions(self):
         res = self.client().get('/categories/8/questions')
@@ -137,6 +230,16 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertIs(data['question']['id'], 14)
 
+    def test_get_quizzes_category_exhausted(self):
+        res = self.client().post('/quizzes', json={
+            "quiz_category": 3,
+            "previous_questions": [13, 14, 15]
+        })
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertIsNone(data['question'])
+
     def test_fail_get_quizzes(self):
         res = self.client().post('/quizzes', json={
 
@@ -146,6 +249,71 @@ class TriviaTestCase(unittest.TestCase):
         self.assertFalse(data['success'])
 
 
+    def test_quiz_session(self):
+        res = self.client().post('/quizzes/sessions', json={
+            "quiz_category": 3
+        })
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], 3)
+
+        asked = []
+        for _ in range(3):
+            res = self.client().post(
+                '/quizzes/sessions/{}/next'.format(data['session_id']))
+            question = json.loads(res.data)['question']
+            asked.append(question['id'])
+        self.assertEqual(sorted(asked), [13, 14, 15])
+
+        res = self.client().post(
+            '/quizzes/sessions/{}/next'.format(data['session_id']))
+        self.assertIsNone(json.loads(res.data)['question'])
+
+    def test_fail_quiz_session_not_found(self):
+        res = self.client().post('/quizzes/sessions/nosuchsession/next')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 404)
+        self.assertFalse(data['success'])
+
+
+class PoolMetricsTestCase(unittest.TestCase):
+    """This class represents the connection pool metrics test case"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            'sqlite:///' + os.path.join(self.directory.name, 'pool.db'),
+            poolclass=InstrumentedQueuePool, pool_size=5, max_overflow=5)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def test_no_overflow_within_pool_size(self):
+        connections = [self.engine.connect() for _ in range(3)]
+        self.assertEqual(self.engine.pool.metrics.overflows, 0)
+        self.assertEqual(self.engine.pool.metrics.in_use, 3)
+        self.assertIn('db_pool_overflow_total 0\n', metrics_text(self.engine))
+        for connection in connections:
+            connection.close()
+        self.assertEqual(self.engine.pool.metrics.in_use, 0)
+
+    def test_overflow_past_pool_size(self):
+        connections = [self.engine.connect() for _ in range(7)]
+        self.assertEqual(self.engine.pool.metrics.overflows, 2)
+        self.assertIn('db_pool_overflow 2\n', metrics_text(self.engine))
+        for connection in connections:
+            connection.close()
+
+    def test_metrics_per_engine(self):
+        other = create_engine(
+            'sqlite:///' + os.path.join(self.directory.name, 'pool.db'),
+            poolclass=InstrumentedQueuePool, pool_size=5)
+        self.engine.connect().close()
+        self.assertEqual(self.engine.pool.metrics.checkouts, 1)
+        self.assertEqual(other.pool.metrics.checkouts, 0)
+        other.dispose()
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
@@ -10,6 +10,7 @@ class QuizView extends Component {
     super();
     this.state = {
       quizCategory: null,
+      quizSession: null,
       previousQuestions: [],
       showAnswer: false,
       categories: {},
@@ -36,7 +37,31 @@ class QuizView extends Component {
   }
 
   selectCategory = ({ type, id = 0 }) => {
-    this.setState({ quizCategory: { type, id } }, this.getNextQuestion);
+    $.ajax({
+      url: "/quizzes/sessions",
+      type: "POST",
+      dataType: "json",
+      contentType: "application/json",
+      data: JSON.stringify({
+        quiz_category: id,
+        length: questionsPerPlay,
+      }),
+      xhrFields: {
+        withCredentials: true,
+      },
+      crossDomain: true,
+      success: (result) => {
+        this.setState(
+          { quizCategory: { type, id }, quizSession: result.session_id },
+          this.getNextQuestion
+        );
+        return;
+      },
+      error: (error) => {
+        alert("Unable to start quiz. Please try your request again");
+        return;
+      },
+    });
   };
 
   handleChange = (event) => {
@@ -50,14 +75,9 @@ class QuizView extends Component {
     }
 
     $.ajax({
-      url: "/quizzes", //TODO: update request URL
+      url: `/quizzes/sessions/${this.state.quizSession}/next`,
       type: "POST",
       dataType: "json",
-      contentType: "application/json",
-      data: JSON.stringify({
-        previous_questions: previousQuestions,
-        quiz_category: this.state.quizCategory.id,
-      }),
       xhrFields: {
         withCredentials: true,
       },
@@ -94,6 +114,7 @@ class QuizView extends Component {
   restartGame = () => {
     this.setState({
       quizCategory: null,
+      quizSession: null,
       previousQuestions: [],
       showAnswer: false,
       numCorrect: 0,
@@ -0,0 +1,101 @@
+"""Shared helpers for the coffee shop benchmarks.
+
+Run a benchmark from the backend directory, e.g. ``python -m benchmarks.auth``.
+Importing this package signs tokens with a throwaway RSA key and points
+``AUTH0_JWKS_URL`` at a local JWKS file holding its public half, so no
+Auth0 tenant is needed. Set ``BENCH_DATABASE_URL`` to benchmark against
+another database; by default an in-memory SQLite database is used.
+"""
+import base64
+import json
+import os
+import tempfile
+import time
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+KID = "benchmark"
+_key = RSA.generate(2048)
+
+
+def _b64(number):
+    data = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+_jwks = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+json.dump({"keys": [{
+    "kty": "RSA", "kid": KID, "use": "sig", "alg": "RS256",
+    "n": _b64(_key.n), "e": _b64(_key.e),
+}]}, _jwks)
+_jwks.close()
+os.environ.setdefault("AUTH0_JWKS_URL", "file://" + _jwks.name)
+
+from src.auth import auth  # noqa: E402  (reads AUTH0_JWKS_URL on import)
+from src.api import app  # noqa: E402
+from src.database.dbpool import engine_options  # noqa: E402
+from src.database.models import db, Drink  # noqa: E402
+
+BENCH_DATABASE_URL = os.environ.get("BENCH_DATABASE_URL", "sqlite://")
+app.config["SQLALCHEMY_DATABASE_URI"] = BENCH_DATABASE_URL
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(BENCH_DATABASE_URL)
+
+COLORS = ("#6f4e37", "#c0a080", "#ffffff", "#3b2f2f", "#d2b48c")
+INGREDIENTS = ("espresso", "milk", "foam", "water", "chocolate", "cream")
+
+PERMISSIONS = [
+    "get:drinks-detail", "post:drinks", "patch:drinks", "delete:drinks",
+]
+
+
+def make_token(permissions=PERMISSIONS, lifetime=3600):
+    now = int(time.time())
+    claims = {
+        "sub": "benchmark|1",
+        "iss": f"https://{auth.AUTH0_DOMAIN}/",
+        "aud": auth.API_AUDIENCE,
+        "iat": now,
+        "exp": now + lifetime,
+        "permissions": permissions,
+    }
+    return jwt.encode(claims, _key.export_key().decode(), algorithm="RS256",
+                      headers={"kid": KID})
+
+
+def reset_db():
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def seed(n_drinks, batch_size=5000):
+    """Add ``n_drinks`` drinks with two to four recipe parts each."""
+    for start in range(0, n_drinks, batch_size):
+        stop = min(start + batch_size, n_drinks)
+        db.session.bulk_insert_mappings(Drink, [
+            {
+                "title": f"Drink {i}",
+                "recipe": [
+                    {
+                        "name": INGREDIENTS[(i + j) % len(INGREDIENTS)],
+                        "color": COLORS[(i + j) % len(COLORS)],
+                        "parts": j + 1,
+                    }
+                    for j in range(2 + i % 3)
+                ],
+            }
+            for i in range(start, stop)
+        ])
+        db.session.commit()
+
+
+def timed(fn, repeat=5):
+    """Best-of-``repeat`` wall time of ``fn()`` in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
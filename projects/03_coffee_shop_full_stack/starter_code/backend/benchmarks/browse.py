@@ -0,0 +1,55 @@
+"""Cost of browsing a large menu page by page.
+
+    python -m benchmarks.browse
+
+Times the first and a deep page of GET /drinks?limit=20, a title prefix
+search with and without the lower(title) index, and an ingredient filter,
+against the rebuilt full menu. All requests go through the Flask test
+client.
+"""
+import sys
+
+from benchmarks import app, db, reset_db, seed, timed
+from src.database.models import menu_cache
+
+SIZES = (10000, 50000)
+
+
+def main():
+    client = app.test_client()
+    print(f"{'drinks':>8} {'full menu':>10} {'first page':>11}"
+          f" {'deep page':>10} {'title':>8} {'no index':>9}"
+          f" {'ingredient':>11}  (ms)")
+    with app.app_context():
+        for size in SIZES:
+            reset_db()
+            seed(size)
+
+            def get(url):
+                return lambda: client.get(url)
+
+            def full_menu():
+                menu_cache.invalidate()
+                client.get("/drinks")
+
+            title = get("/drinks?title=drink%204242")
+            row = [
+                timed(full_menu, repeat=3),
+                timed(get("/drinks?limit=20")),
+                timed(get(f"/drinks?limit=20&after={size - 100}")),
+                timed(title),
+            ]
+            if db.engine.dialect.name == "postgresql":
+                db.session.execute("DROP INDEX ix_drink_title_lower_c")
+            else:
+                db.session.execute("DROP INDEX ix_drink_title_lower")
+            row.append(timed(title))
+            row.append(timed(get("/drinks?ingredient=chocolate&limit=20")))
+            print(f"{size:>8} {row[0]:>10.2f} {row[1]:>11.2f}"
+                  f" {row[2]:>10.2f} {row[3]:>8.2f} {row[4]:>9.2f}"
+                  f" {row[5]:>11.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Throughput of GET /drinks with thousands of drinks on the menu.
+
+    python -m benchmarks.drinks
+
+Compares the previous view (recipe mapped as a string, parsed with
+json.loads and printed for every drink on every request) with rebuilding
+the cached menu bodies from a plain select of the JSON column. The menu
+cache is dropped before every request so the encoding is measured, not
+the cache hit; see benchmarks.polling for that.
+"""
+import io
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+
+from flask import jsonify
+from sqlalchemy import Column, Integer, MetaData, String, Table
+from sqlalchemy.orm import mapper
+
+from benchmarks import app, db, reset_db, seed
+from src import api
+from src.database.models import menu_cache
+
+SIZES = (1000, 5000)
+REQUESTS = 20
+
+
+class LegacyDrink:
+    def short(self):
+        print(json.loads(self.recipe))
+        short_recipe = [{'color': r['color'], 'parts': r['parts']}
+                        for r in json.loads(self.recipe)]
+        return {'id': self.id, 'title': self.title, 'recipe': short_recipe}
+
+
+# The drink table as it was mapped before, with the recipe as plain text.
+mapper(LegacyDrink, Table(
+    "drink", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("title", String(80)),
+    Column("recipe", String),
+))
+
+
+def legacy_get_drinks():
+    drinks = db.session.query(LegacyDrink).all()
+    return jsonify({
+        "success": True,
+        "drinks": [drink.short() for drink in drinks]
+    })
+
+
+def uncached_get_drinks():
+    menu_cache.invalidate()
+    return api.get_drinks()
+
+
+def requests_per_second(view):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        with app.test_request_context("/drinks"):
+            view().get_data()
+            db.session.remove()
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{'drinks':>8} {'legacy req/s':>14} {'req/s':>10}")
+    with app.app_context():
+        for size in SIZES:
+            reset_db()
+            seed(size)
+            with redirect_stdout(io.StringIO()):
+                legacy = requests_per_second(legacy_get_drinks)
+            rate = requests_per_second(uncached_get_drinks)
+            print(f"{size:>8} {legacy:>14.1f} {rate:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Load test of the Flask and ASGI deployments at 200 concurrent clients.
+
+    python -m benchmarks.load
+
+Seeds a SQLite file, then serves it with the Flask app on Werkzeug's
+threaded server and with src.asgi on uvicorn, one process each, in turn.
+CLIENTS concurrent clients send requests for DURATION seconds, each over a
+new connection: mostly GET /drinks from the menu cache, plus pages of
+GET /drinks?after= and authenticated GET /drinks-detail. The ASGI server
+needs the packages in requirements-async.txt.
+"""
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import app, make_token, reset_db, seed
+from src.database.dbpool import engine_options
+
+CLIENTS = 200
+DURATION = 10
+DRINKS = 1000
+PORT = 5077
+
+SERVERS = {
+    "flask": [sys.executable, "-c",
+              "from src.api import app;"
+              f"app.run(port={PORT}, threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "src.asgi:app",
+             "--port", str(PORT), "--log-level", "warning"],
+}
+
+
+def pick_request(token):
+    roll = random.random()
+    if roll < 0.8:
+        return "/drinks", ""
+    if roll < 0.9:
+        return f"/drinks?limit=20&after={random.randrange(DRINKS)}", ""
+    return "/drinks-detail", f"Authorization: Bearer {token}\r\n"
+
+
+async def request(path, headers):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    writer.write((f"GET {path} HTTP/1.1\r\nHost: localhost\r\n{headers}"
+                  "Connection: close\r\n\r\n").encode())
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def client(token, deadline, latencies, failures):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            status = await request(*pick_request(token))
+        except (OSError, IndexError, ValueError):
+            status = None
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures.append(status)
+
+
+async def load(token):
+    latencies, failures = [], []
+    deadline = time.perf_counter() + DURATION
+    await asyncio.gather(*(client(token, deadline, latencies, failures)
+                           for _ in range(CLIENTS)))
+    return sorted(latencies), failures
+
+
+def wait_until_up(timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if asyncio.run(request("/drinks", "")) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    token = make_token()
+    print(f"{CLIENTS} clients, {DURATION} s per server, {DRINKS} drinks")
+    print(f"{'server':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}"
+          f" {'failed':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'load.db')}"
+        app.config["SQLALCHEMY_DATABASE_URI"] = url
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(url)
+        with app.app_context():
+            reset_db()
+            seed(DRINKS)
+        env = dict(os.environ, DATABASE_URL=url)
+
+        for name, command in SERVERS.items():
+            server = subprocess.Popen(command, env=env,
+                                      stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up()
+                latencies, failures = asyncio.run(load(token))
+            finally:
+                server.terminate()
+                server.wait()
+            p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            print(f"{name:>8} {len(latencies) / DURATION:>9.1f}"
+                  f" {p50:>8.1f} {p99:>8.1f} {len(failures):>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Cost of a storefront poll of GET /drinks.
+
+    python -m benchmarks.polling
+
+Times a poll that has to load and serialize the menu, one answered from
+the encoded body kept for the current menu version, and a conditional poll
+that gets a 304 back. All three go through the Flask test client.
+"""
+import sys
+
+from benchmarks import app, reset_db, seed, timed
+from src.database.models import menu_cache
+
+SIZES = (100, 1000, 5000)
+POLLS = 50
+
+
+def main():
+    client = app.test_client()
+    print(f"{'drinks':>8} {'rebuilt ms':>11} {'cached ms':>10} {'304 ms':>8}")
+    with app.app_context():
+        for size in SIZES:
+            reset_db()
+            seed(size)
+            etag = client.get("/drinks").headers["ETag"]
+
+            def rebuilt():
+                menu_cache.invalidate()
+                client.get("/drinks")
+
+            def cached():
+                for _ in range(POLLS):
+                    client.get("/drinks")
+
+            def not_modified():
+                for _ in range(POLLS):
+                    response = client.get(
+                        "/drinks", headers={"If-None-Match": etag})
+                    assert response.status_code == 304
+
+            print(f"{size:>8} {timed(rebuilt):>11.2f}"
+                  f" {timed(cached) / POLLS:>10.2f}"
+                  f" {timed(not_modified) / POLLS:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
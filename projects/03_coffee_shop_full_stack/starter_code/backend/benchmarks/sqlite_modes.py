@@ -0,0 +1,143 @@
+"""Concurrent reads and writes on a SQLite file, default vs tuned mode.
+
+    python -m benchmarks.sqlite_modes
+
+For each mode a fresh database file is seeded, then READERS threads read
+pages of drinks while WRITERS threads update recipes, each in its own
+short transaction, for DURATION seconds. The default mode leaves SQLite's
+rollback journal and full fsyncs in place (SQLITE_MODE=default); the tuned
+mode applies the pragmas from src/database/dbpool.py. The queries are the
+ones GET /drinks?after= and PATCH /drinks/<id> run, issued on an engine
+built from engine_options() without Flask, so the database rather than
+request handling sets the pace. Set BENCH_DIR to put the files on another
+disk; by default they go in the system temp directory.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, select
+
+from benchmarks import COLORS, INGREDIENTS
+from src.database.dbpool import engine_options
+from src.database.models import Drink
+
+MODES = ("default", "tuned")
+DRINKS = 500
+READERS = 8
+WRITERS = 2
+DURATION = 5
+PAGE = 20
+
+drink = Drink.__table__
+
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+        self.latencies = []
+
+    def record(self, ok, latency):
+        with self.lock:
+            if ok:
+                self.done += 1
+                self.latencies.append(latency)
+            else:
+                self.failed += 1
+
+
+def recipe():
+    return [{
+        "name": random.choice(INGREDIENTS),
+        "color": random.choice(COLORS),
+        "parts": random.randrange(1, 5),
+    } for _ in range(3)]
+
+
+def read(engine):
+    with engine.connect() as connection:
+        connection.execute(
+            select([drink.c.id, drink.c.title, drink.c.recipe])
+            .where(drink.c.id > random.randrange(DRINKS))
+            .order_by(drink.c.id).limit(PAGE)).fetchall()
+
+
+def write(engine):
+    with engine.begin() as connection:
+        connection.execute(
+            drink.update()
+            .where(drink.c.id == random.randrange(1, DRINKS + 1))
+            .values(recipe=recipe()))
+
+
+def worker(engine, operation, counter, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            operation(engine)
+            ok = True
+        except Exception:
+            ok = False
+        counter.record(ok, time.perf_counter() - start)
+
+
+def run(mode, directory):
+    os.environ["SQLITE_MODE"] = mode
+    url = f"sqlite:///{os.path.join(directory, mode + '.db')}"
+    engine = create_engine(url, **engine_options(url))
+    drink.create(engine)
+    with engine.begin() as connection:
+        connection.execute(drink.insert(), [
+            {"title": f"Drink {i}", "recipe": recipe()}
+            for i in range(DRINKS)
+        ])
+
+    reads, writes = Counter(), Counter()
+    stop = threading.Event()
+    threads = (
+        [threading.Thread(target=worker, args=(engine, read, reads, stop))
+         for _ in range(READERS)] +
+        [threading.Thread(target=worker, args=(engine, write, writes, stop))
+         for _ in range(WRITERS)]
+    )
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return reads, writes
+
+
+def percentile(latencies, fraction):
+    if not latencies:
+        return float("nan")
+    latencies = sorted(latencies)
+    return latencies[min(int(len(latencies) * fraction),
+                         len(latencies) - 1)] * 1000
+
+
+def main():
+    print(f"{READERS} readers, {WRITERS} writers, {DRINKS} drinks,"
+          f" {DURATION} s per mode")
+    print(f"{'mode':>8} {'reads/s':>9} {'writes/s':>9} {'read p50 ms':>12}"
+          f" {'write p50 ms':>13} {'failed':>7}")
+    with tempfile.TemporaryDirectory(dir=os.environ.get("BENCH_DIR")) as directory:
+        for mode in MODES:
+            reads, writes = run(mode, directory)
+            print(f"{mode:>8} {reads.done / DURATION:>9.1f}"
+                  f" {writes.done / DURATION:>9.1f}"
+                  f" {percentile(reads.latencies, 0.5):>12.2f}"
+                  f" {percentile(writes.latencies, 0.5):>13.2f}"
+                  f" {reads.failed + writes.failed:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,11 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
 from sqlalchemy import exc
-import json
 from flask_cors import CORS
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db, db_drop_and_create_all, setup_db, Drink, menu_cache, menu_version
+from .database.browse import BROWSE_ARGS, browse, browse_args
 from .auth.auth import AuthError, requires_auth
+from .database.dbpool import metrics_text
 
 app = Flask(__name__)
 setup_db(app)
@@ -17,29 +18,54 @@ CORS(app)
 '''
 #db_drop_and_create_all()
 
+'''
+menu_response(view, cache_control)
+    the drink listing in the given view ('short' or 'long'), or a 304 if the
+    client already has it
+    Without browse arguments the whole menu is served from menu_cache.
+    With any of limit, after, title or ingredient one page of the matching
+    drinks is read instead. Either body is a function of the menu version
+    and the URL alone, so the version serves as a strong ETag for both.
+'''
+def menu_response(view, cache_control):
+    browsing = any(arg in request.args for arg in BROWSE_ARGS)
+    if browsing:
+        try:
+            limit, after, title, ingredient = browse_args(request.args)
+        except ValueError:
+            abort(400)
+        version = menu_version()
+    else:
+        version, bodies = menu_cache.current()
+
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    elif browsing:
+        page = browse(view, limit, after, title, ingredient)
+        response = jsonify({
+            "success": True,
+            "drinks": page.drinks,
+            "next_cursor": page.next_cursor
+        })
+    else:
+        response = Response(bodies[view], mimetype='application/json')
+    response.set_etag(version)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 # ROUTES
 
 # GET /drinks (Public)
 @app.route('/drinks', methods=['GET'])
 def get_drinks():
-    drinks = Drink.query.all()
-
-    return jsonify({
-        "success": True,
-        "drinks": [drink.short() for drink in drinks]
-        })
+    return menu_response('short', 'no-cache')
 
 
 # GET /drinks - Requires get:drinks-detail permission
 @app.route('/drinks-detail', methods=['GET'])
 @requires_auth('get:drinks-detail')
 def get_drinks_detail():
-    drinks = Drink.query.all()
-
-    return jsonify({
-        "success": True,
-        "drinks": [drink.long() for drink in drinks]
-    })
+    return menu_response('long', 'private, no-cache')
 
 
 # POST /drinks - Requires post:drinks permission
@@ -53,7 +79,7 @@ def post_drinks():
     if recipe is None or title is None:
         abort(422)
     try:
-        drink = Drink(title=title, recipe=json.dumps(recipe))
+        drink = Drink(title=title, recipe=recipe)
         drink.insert()
     except exc.SQLAlchemyError as error:
         print(error)
@@ -85,7 +111,7 @@ def update_drinks(drink_id):
         if title:
             drink.title = title
         if recipe:
-            drink.recipe = json.dumps(recipe)
+            drink.recipe = recipe
         drink.update()
 
     except exc.SQLAlchemyError as error:
@@ -118,8 +144,22 @@ def delete_drinks(drink_id):
     })
 
 
+# GET /metrics - connection pool metrics in Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics_text(db.engine), mimetype='text/plain')
+
+
 # Error Handling
 
+@app.errorhandler(400)
+def bad_request(error):
+    return jsonify({
+        "success": False, 
+        "error": 400,
+        "message": "bad request"
+        }), 400
+
 @app.errorhandler(422)
 def unprocessable(error):
     return jsonify({
@@ -0,0 +1,309 @@
+'''
+Async (ASGI) deployment of the coffee shop API.
+
+    uvicorn src.asgi:app
+
+Serves the same drink routes, JSON bodies, ETags and AuthError responses
+as the Flask app in api.py, without holding a worker while the database or Auth0
+is busy. Queries are the SQLAlchemy Core statements the Flask app runs,
+executed by the databases package over aiosqlite or asyncpg; SQLAlchemy
+1.3 has no asyncio support of its own. Tokens already verified are
+answered from the shared token cache on the event loop; the signature
+check, and the JWKS fetch it may need, run in the thread pool.
+
+There is no /metrics route: the Flask app's metrics describe its
+SQLAlchemy pool, which this app does not use.
+
+The database must have been set up by the Flask app, which creates the
+menu_version table and the browse indexes (see models.upgrade_db). The
+async app needs the packages in requirements-async.txt.
+'''
+import asyncio
+import logging
+import os
+import sqlite3
+
+from databases import Database
+from sqlalchemy import select
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from werkzeug.http import parse_etags
+
+try:
+    import asyncpg
+except ImportError:  # only needed for PostgreSQL
+    asyncpg = None
+
+from .auth.auth import (AuthError, check_permissions, parse_auth_header,
+                        verified_tokens, verify_decode_jwt)
+from .database.browse import BROWSE_ARGS, browse_args, browse_query, make_page
+from .database.models import (BUMP_MENU_VERSION, SELECT_MENU,
+                               SELECT_MENU_VERSION, Drink, database_path,
+                               encode_menu, format_drink, insert_menu_version,
+                               version_tag)
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL', database_path)
+DB_ERRORS = (sqlite3.Error,) + ((asyncpg.PostgresError,) if asyncpg else ())
+
+database = Database(DATABASE_URL)
+drink = Drink.__table__
+
+
+def drink_row(row):
+    return row['id'], row['title'], row['recipe']
+
+
+async def menu_version():
+    row = await database.fetch_one(SELECT_MENU_VERSION)
+    if row is None:
+        # As in models.menu_version: put a deleted row back.
+        try:
+            await database.execute(insert_menu_version())
+        except DB_ERRORS:
+            pass  # another worker put it back first
+        row = await database.fetch_one(SELECT_MENU_VERSION)
+    return version_tag(row['generation'], row['version'])
+
+
+'''
+MenuCache
+    the async counterpart of models.MenuCache, holding the same encoded
+    listings for the same menu versions
+'''
+class MenuCache:
+    def __init__(self):
+        self._entry = None
+        self._lock = None
+
+    async def current(self):
+        entry = self._entry
+        if entry is not None and entry[0] == await menu_version():
+            return entry
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            version = await menu_version()
+            entry = self._entry
+            if entry is None or entry[0] != version:
+                rows = await database.fetch_all(SELECT_MENU)
+                entry = (version, encode_menu([drink_row(row) for row in rows]))
+                self._entry = entry
+            return entry
+
+
+menu_cache = MenuCache()
+
+
+'''
+requires_auth(permission)
+    the async counterpart of auth.requires_auth
+'''
+def requires_auth(permission=''):
+    def requires_auth_decorator(f):
+        async def wrapper(request):
+            token = parse_auth_header(request.headers.get('Authorization'))
+            payload = verified_tokens.get(token)
+            if payload is None:
+                payload = await run_in_threadpool(verify_decode_jwt, token)
+            check_permissions(permission, payload)
+            return await f(request)
+
+        return wrapper
+    return requires_auth_decorator
+
+
+async def json_body(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(400)
+    if not isinstance(data, dict):
+        raise HTTPException(422)
+    return data
+
+
+async def menu_response(request, view, cache_control):
+    args = request.query_params
+    browsing = any(arg in args for arg in BROWSE_ARGS)
+    if browsing:
+        try:
+            limit, after, title, ingredient = browse_args(args)
+        except ValueError:
+            raise HTTPException(400)
+        version = await menu_version()
+    else:
+        version, bodies = await menu_cache.current()
+
+    if parse_etags(request.headers.get('If-None-Match')).contains(version):
+        response = Response(status_code=304)
+    elif browsing:
+        query = browse_query(limit, after, title, ingredient,
+                             database.url.dialect)
+        rows = await database.fetch_all(query)
+        page = make_page(view, [drink_row(row) for row in rows], limit)
+        response = JSONResponse({
+            "success": True,
+            "drinks": page.drinks,
+            "next_cursor": page.next_cursor
+        })
+    else:
+        response = Response(bodies[view], media_type='application/json')
+    response.headers['ETag'] = f'"{version}"'
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+# ROUTES
+
+# GET /drinks (Public)
+async def get_drinks(request):
+    return await menu_response(request, 'short', 'no-cache')
+
+
+# GET /drinks-detail - Requires get:drinks-detail permission
+@requires_auth('get:drinks-detail')
+async def get_drinks_detail(request):
+    return await menu_response(request, 'long', 'private, no-cache')
+
+
+# POST /drinks - Requires post:drinks permission
+@requires_auth('post:drinks')
+async def post_drinks(request):
+    data = await json_body(request)
+    title = data.get('title', None)
+    recipe = data.get('recipe', None)
+    # Request body must contain both a title and recipe
+    if recipe is None or title is None:
+        raise HTTPException(422)
+    query = drink.insert().values(title=title, recipe=recipe)
+    if database.url.dialect == 'postgresql':
+        query = query.returning(drink.c.id)
+    try:
+        async with database.transaction():
+            drink_id = await database.execute(query)
+            await database.execute(BUMP_MENU_VERSION)
+    except DB_ERRORS as error:
+        logger.warning('drink write failed: %s', error)
+        raise HTTPException(422)
+    await menu_cache.current()
+
+    return JSONResponse({
+        "success": True,
+        "drinks": [format_drink('long', drink_id, title, recipe)]
+    })
+
+
+# PATCH /drinks/:id - Requires patch:drinks permission
+@requires_auth('patch:drinks')
+async def update_drinks(request):
+    drink_id = request.path_params['drink_id']
+    data = await json_body(request)
+    title = data.get('title', None)
+    recipe = data.get('recipe', None)
+    # Request body must contain either a title or a recipe or both
+    if recipe is None and title is None:
+        raise HTTPException(422)
+
+    try:
+        async with database.transaction():
+            row = await database.fetch_one(
+                select([drink]).where(drink.c.id == drink_id))
+            if row is None:
+                raise HTTPException(404)
+            _, current_title, current_recipe = drink_row(row)
+            values = {}
+            if title and title != current_title:
+                values['title'] = title
+            if recipe and recipe != current_recipe:
+                values['recipe'] = recipe
+            # Like a flush with no changes, an identical PATCH keeps the
+            # menu version.
+            if values:
+                await database.execute(
+                    drink.update().where(drink.c.id == drink_id)
+                    .values(**values))
+                await database.execute(BUMP_MENU_VERSION)
+    except DB_ERRORS as error:
+        logger.warning('drink write failed: %s', error)
+        raise HTTPException(422)
+    await menu_cache.current()
+
+    return JSONResponse({
+        "success": True,
+        "drinks": [format_drink(
+            'long', drink_id, values.get('title', current_title),
+            values.get('recipe', current_recipe))]
+    })
+
+
+# DELETE /drinks/:id - Requires delete:drinks permission
+@requires_auth('delete:drinks')
+async def delete_drinks(request):
+    drink_id = request.path_params['drink_id']
+    try:
+        async with database.transaction():
+            deleted = await database.fetch_one(
+                select([drink.c.id]).where(drink.c.id == drink_id))
+            if deleted is None:
+                raise HTTPException(404)
+            await database.execute(drink.delete().where(drink.c.id == drink_id))
+            await database.execute(BUMP_MENU_VERSION)
+    except DB_ERRORS as error:
+        logger.warning('drink write failed: %s', error)
+        raise HTTPException(422)
+    await menu_cache.current()
+
+    return JSONResponse({
+        "success": True,
+        "delete": drink_id
+    })
+
+
+# Error Handling
+
+MESSAGES = {
+    400: "bad request",
+    404: "resource not found",
+    422: "unprocessable"
+}
+
+
+async def http_error(request, error):
+    return JSONResponse({
+        "success": False,
+        "error": error.status_code,
+        "message": MESSAGES.get(error.status_code, error.detail)
+    }, status_code=error.status_code)
+
+
+#AuthError defined in auth.py
+async def authentication(request, error):
+    return JSONResponse(error.error, status_code=401)
+
+
+app = Starlette(
+    routes=[
+        Route('/drinks', get_drinks, methods=['GET']),
+        Route('/drinks-detail', get_drinks_detail, methods=['GET']),
+        Route('/drinks', post_drinks, methods=['POST']),
+        Route('/drinks/{drink_id:int}', update_drinks, methods=['PATCH']),
+        Route('/drinks/{drink_id:int}', delete_drinks, methods=['DELETE']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'],
+                   allow_methods=['*'], allow_headers=['*']),
+    ],
+    exception_handlers={
+        HTTPException: http_error,
+        AuthError: authentication,
+    },
+    on_startup=[database.connect],
+    on_shutdown=[database.disconnect],
+)
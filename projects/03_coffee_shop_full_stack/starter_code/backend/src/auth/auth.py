@@ -1,14 +1,26 @@
-import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSCache, JWKSUnavailable
+from .tokens import VerifiedPayload, VerifiedTokenCache
 
 
 AUTH0_DOMAIN = 'classudacity.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'coffee'
 
+# Point AUTH0_JWKS_URL at a file:// or local URL to run against test keys.
+JWKS_URL = os.environ.get(
+    'AUTH0_JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+jwks = JWKSCache(
+    JWKS_URL,
+    ttl=int(os.environ.get('AUTH0_JWKS_TTL', 3600)),
+    min_refetch_interval=int(os.environ.get('AUTH0_JWKS_MIN_REFETCH', 30)))
+verified_tokens = VerifiedTokenCache(
+    max_entries=int(os.environ.get('AUTH0_TOKEN_CACHE_SIZE', 1024)))
+
 # clientId: "0p05fRWKlFcByjn0Jx2G1qmj0ioiglgI"
 
 # AuthError Exception
@@ -21,7 +33,10 @@ class AuthError(Exception):
 # Auth Header
 
 def get_token_auth_header():
-    auth = request.headers.get('Authorization', None)
+    return parse_auth_header(request.headers.get('Authorization', None))
+
+
+def parse_auth_header(auth):
     if not auth:
         raise AuthError({
             'code': 'authorization_header_missing',
@@ -52,25 +67,24 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload
+
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    try:
+        rsa_key = jwks.get_key(unverified_header['kid'])
+    except JWKSUnavailable:
+        raise AuthError({
+            'code': 'jwks_unavailable',
+            'description': 'Unable to fetch the signing keys.'
+        }, 401)
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -81,6 +95,8 @@ def verify_decode_jwt(token):
                 issuer='https://' + AUTH0_DOMAIN + '/'
             )
 
+            payload = VerifiedPayload(payload)
+            verified_tokens.set(token, payload)
             return payload
 
         except jwt.ExpiredSignatureError:
@@ -112,7 +128,9 @@ def check_permissions(permission, payload):
             'description': 'Permissions not included in JWT.'
         }, 400)
     
-    if permission not in payload['permissions']:
+    # Payloads from verify_decode_jwt carry their permissions as a set.
+    permissions = getattr(payload, 'permission_set', payload['permissions'])
+    if permission not in permissions:
         raise AuthError({
             'code': 'unauthorized',
             'description': 'Permission not found.'
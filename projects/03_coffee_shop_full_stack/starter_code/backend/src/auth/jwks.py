@@ -0,0 +1,125 @@
+import json
+import logging
+import threading
+import time
+from urllib.request import urlopen
+
+logger = logging.getLogger(__name__)
+
+# Fields of a JWK that jose needs to build an RSA public key.
+KEY_FIELDS = ('kty', 'kid', 'use', 'n', 'e')
+
+
+class JWKSUnavailable(Exception):
+    '''No signing keys could be fetched from the JWKS URL.'''
+
+
+'''
+JWKSCache
+    signing keys from a JWKS document, indexed by kid
+
+    Keys are fetched once and reused until ttl seconds have passed. A
+    background thread refreshes them shortly before that, so requests do
+    not wait on the identity provider. A token signed with a kid we have
+    not seen triggers an immediate refetch (key rotation), but at most
+    once every min_refetch_interval seconds so that forged kids cannot
+    make us hammer the provider. If a refresh fails the previous keys keep
+    being served; until a first fetch succeeds, get_key raises
+    JWKSUnavailable.
+
+    url may be any URL urlopen accepts, including file:// for a local JWKS
+    document or http://localhost for a stub server.
+'''
+class JWKSCache:
+    def __init__(self, url, ttl=3600, min_refetch_interval=30, timeout=5,
+                 background=True):
+        self.url = url
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.background = background
+        self.keys = {}
+        self.expires = 0
+        self.last_attempt = None
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def fetch(self):
+        with urlopen(self.url, timeout=self.timeout) as response:
+            jwks = json.loads(response.read())
+        return {
+            key['kid']: {field: key[field] for field in KEY_FIELDS}
+            for key in jwks['keys']
+            if key.get('kty') == 'RSA' and 'kid' in key
+        }
+
+    def refresh(self, needed=None):
+        '''
+        Refetch the keys; on failure keep serving the ones we have. needed,
+        if given, is checked again once the lock is held, so requests that
+        queued behind a refresh do not each fetch the document again.
+        '''
+        with self._lock:
+            if needed is not None and not needed():
+                return False
+            self.last_attempt = time.monotonic()
+            try:
+                keys = self.fetch()
+            except Exception as error:
+                if not self.keys:
+                    raise JWKSUnavailable(str(error)) from error
+                logger.exception('JWKS refresh failed; serving cached keys')
+                return False
+            self.keys = keys
+            self.expires = time.monotonic() + self.ttl
+            return True
+
+    def get_key(self, kid):
+        '''
+        Returns the key for kid, or None if the provider has no such key.
+        Raises JWKSUnavailable while no keys could be fetched at all.
+        '''
+        self._start_refresher()
+        if not self.keys:
+            self.refresh(self._unfetched)
+            if not self.keys:
+                raise JWKSUnavailable('no signing keys fetched yet')
+        elif self._expired():
+            # Normally the background thread has refreshed already.
+            self.refresh(self._expired)
+        key = self.keys.get(kid)
+        if key is None and self._may_refetch():
+            self.refresh(lambda: kid not in self.keys and self._may_refetch())
+            key = self.keys.get(kid)
+        return key
+
+    def _may_refetch(self):
+        return (self.last_attempt is None or
+                time.monotonic() - self.last_attempt
+                >= self.min_refetch_interval)
+
+    def _unfetched(self):
+        return not self.keys and self._may_refetch()
+
+    def _expired(self):
+        return time.monotonic() >= self.expires and self._may_refetch()
+
+    def _start_refresher(self):
+        if not self.background or self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name='jwks-refresh',
+                    daemon=True)
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            # Refresh a little before expiry; retry sooner after a failure.
+            delay = self.expires - time.monotonic() - self.ttl * 0.1
+            time.sleep(max(delay, self.min_refetch_interval))
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('JWKS refresh failed')
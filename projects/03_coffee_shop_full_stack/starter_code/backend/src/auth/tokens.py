@@ -0,0 +1,60 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+'''
+VerifiedPayload
+    the claims of a verified token, with its permissions as a set so that
+    permission checks are a single membership test
+'''
+class VerifiedPayload(dict):
+    def __init__(self, claims):
+        super().__init__(claims)
+        self.permission_set = frozenset(claims.get('permissions') or ())
+
+
+'''
+VerifiedTokenCache
+    a bounded LRU of tokens whose signature and claims have already been
+    verified, so a client repeating the same bearer token skips the RS256
+    check. Entries are keyed by a hash of the token, never the token
+    itself, and are dropped once the token's exp has passed. Tokens
+    without an exp claim are not cached.
+'''
+class VerifiedTokenCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, token, payload):
+        expires = payload.get('exp')
+        if not isinstance(expires, (int, float)):
+            return
+        with self._lock:
+            self._entries[self.key(token)] = (expires, payload)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
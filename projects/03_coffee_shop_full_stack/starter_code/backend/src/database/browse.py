@@ -0,0 +1,106 @@
+'''
+Paginated and filtered drink listings.
+
+browse(view, limit, after, title, ingredient) returns one page of drinks in
+the short or long form, ordered by id, and the cursor of the page after it.
+Rows are read with a plain select, as for the cached full menu. The async
+app runs browse_query() and make_page() itself.
+
+Titles are matched by case-insensitive prefix through the lower(title)
+expression index: the prefix becomes a range on that index and a LIKE
+rechecks the rows the range finds. The range is in code point order, so on
+PostgreSQL the index and the comparisons use the "C" collation. SQLite's
+lower() only folds ASCII letters, so there only ASCII letters in the prefix
+are folded and other letters match with their case. Ingredients are matched by exact name.
+On PostgreSQL the recipe containment test (@>) is served by the GIN
+jsonb_path_ops index; SQLite cannot index the elements of an array, so
+there each candidate recipe is scanned with json_each.
+'''
+import os
+import string
+from collections import namedtuple
+
+from sqlalchemy import func, select, text, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .models import db, Drink, format_drink
+
+Page = namedtuple('Page', ['drinks', 'next_cursor'])
+
+# Page size when a page is asked for without a limit
+DRINKS_PER_PAGE = int(os.environ.get('DRINKS_PER_PAGE', 20))
+MAX_DRINKS_PER_PAGE = int(os.environ.get('MAX_DRINKS_PER_PAGE', 100))
+# Query arguments that select a page of the menu rather than all of it
+BROWSE_ARGS = ('limit', 'after', 'title', 'ingredient')
+
+# Largest code point; a prefix ending in it has no upper bound.
+MAX_CHAR = 0x10FFFF
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def escape_like(text):
+    return (text.replace('\\', '\\\\')
+            .replace('%', '\\%').replace('_', '\\_'))
+
+
+def browse_args(args):
+    '''
+    (limit, after, title, ingredient) from a mapping of query arguments.
+    Raises ValueError if limit or after is not a valid integer.
+    '''
+    limit = int(args.get('limit', DRINKS_PER_PAGE))
+    after = args.get('after')
+    if after is not None:
+        after = int(after)
+    if not 1 <= limit <= MAX_DRINKS_PER_PAGE:
+        raise ValueError(f'limit must be between 1 and {MAX_DRINKS_PER_PAGE}')
+    return limit, after, args.get('title'), args.get('ingredient')
+
+
+def browse(view, limit, after=None, title=None, ingredient=None):
+    dialect = db.session.get_bind().dialect.name
+    query = browse_query(limit, after, title, ingredient, dialect)
+    return make_page(view, db.session.execute(query).fetchall(), limit)
+
+
+def browse_query(limit, after, title, ingredient, dialect):
+    table = Drink.__table__
+    query = (select([table.c.id, table.c.title, table.c.recipe])
+             .order_by(table.c.id))
+    if after is not None:
+        query = query.where(table.c.id > after)
+
+    if title:
+        lower_title = func.lower(table.c.title)
+        if dialect == 'postgresql':
+            prefix = title.lower()
+            lower_title = lower_title.collate('C')
+        else:
+            prefix = title.translate(ASCII_LOWER)
+        query = query.where(lower_title >= prefix).where(
+            lower_title.like(escape_like(prefix) + '%', escape='\\'))
+        if ord(prefix[-1]) < MAX_CHAR:
+            query = query.where(
+                lower_title < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+    if ingredient:
+        if dialect == 'postgresql':
+            query = query.where(table.c.recipe.op('@>')(
+                type_coerce([{'name': ingredient}], JSONB)))
+        else:
+            query = query.where(text(
+                "EXISTS (SELECT 1 FROM json_each(drink.recipe) "
+                "WHERE json_extract(json_each.value, '$.name') = :ingredient)"
+            ).bindparams(ingredient=ingredient))
+
+    # One extra row tells us whether there is a next page.
+    return query.limit(limit + 1)
+
+
+def make_page(view, rows, limit):
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return Page(
+        [format_drink(view, *row) for row in rows],
+        rows[-1][0] if has_next else None
+    )
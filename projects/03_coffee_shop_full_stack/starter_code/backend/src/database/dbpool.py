@@ -0,0 +1,180 @@
+"""Environment-driven SQLAlchemy engine options and connection pool metrics.
+
+``engine_options(database_uri)`` builds ``SQLALCHEMY_ENGINE_OPTIONS`` from:
+
+    DB_POOL_SIZE           connections kept open (default 5)
+    DB_MAX_OVERFLOW        extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT        seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE        seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING       test connections before use (default true)
+    DB_STATEMENT_TIMEOUT   PostgreSQL statement timeout in ms (default off)
+
+SQLite databases get these pragmas on every new connection unless
+``SQLITE_MODE`` is ``default``, which leaves SQLite's own settings alone:
+
+    SQLITE_JOURNAL_MODE    journal mode (default WAL)
+    SQLITE_SYNCHRONOUS     when to fsync (default NORMAL)
+    SQLITE_BUSY_TIMEOUT    ms to wait for a lock before failing (default 5000)
+    SQLITE_MMAP_SIZE       bytes of the file read through mmap (default 256 MiB)
+    SQLITE_CACHE_SIZE      page cache; negative values are KiB (default -65536)
+
+WAL lets readers carry on while a writer commits, and with synchronous=NORMAL
+a commit no longer waits for an fsync (a power loss can undo the last
+commits but not corrupt the file). The journal mode is stored in the
+database file, so going back takes SQLITE_JOURNAL_MODE=DELETE rather than
+SQLITE_MODE=default. In this mode connections to a SQLite file are pooled
+with the DB_POOL_* settings, so the pragmas run once per connection.
+
+Each pool built from these options records how long its checkouts wait,
+how many of its connections are in use and how often it overflows or
+times out. ``metrics_text(engine)`` renders those numbers in the
+Prometheus text format.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.wait_seconds_sum = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflows = 0
+        self.timeouts = 0
+
+    def checked_out(self, seconds, overflowed):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_seconds_sum += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if overflowed:
+                self.overflows += 1
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout wait time, overflow and timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        # _overflow counts from -pool_size, so it only goes above zero once
+        # every pooled connection is out and an overflow one is opened.
+        overflow = max(self._overflow, 0)
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timed_out()
+            raise
+        self.metrics.checked_out(time.perf_counter() - start,
+                                 max(self._overflow, 0) > overflow)
+        return connection
+
+    def _do_return_conn(self, conn):
+        try:
+            super()._do_return_conn(conn)
+        finally:
+            self.metrics.checked_in()
+
+    def recreate(self):
+        # Engine.dispose() swaps in a new pool; keep counting where we were.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def sqlite_pragmas():
+    """The pragmas applied to SQLite connections, in order."""
+    if os.environ.get("SQLITE_MODE", "tuned").lower() == "default":
+        return []
+    return [
+        ("journal_mode", os.environ.get("SQLITE_JOURNAL_MODE", "WAL")),
+        ("synchronous", os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")),
+        ("busy_timeout", _env_int("SQLITE_BUSY_TIMEOUT", 5000)),
+        ("mmap_size", _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        ("cache_size", _env_int("SQLITE_CACHE_SIZE", -65536)),
+    ]
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return set_pragmas
+
+
+def engine_options(database_uri):
+    options = {
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+    if database_uri.startswith("sqlite"):
+        pragmas = sqlite_pragmas()
+        # SQLite gets its own pool class from SQLAlchemy; sizing does not apply.
+        if not pragmas:
+            return options
+        options["pool_events"] = [(_pragma_setter(pragmas), "connect")]
+        if database_uri in ("sqlite://", "sqlite:///:memory:"):
+            return options
+        # SQLAlchemy opens a new connection to a SQLite file for every
+        # checkout, which would set the pragmas and map the file each time.
+        # Pool them like any other database instead.
+        options["connect_args"] = {"check_same_thread": False}
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+    )
+    statement_timeout = _env_int("DB_STATEMENT_TIMEOUT", 0)
+    if statement_timeout and database_uri.startswith("postgres"):
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={statement_timeout}"
+        }
+    return options
+
+
+def metrics_text(engine):
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return ""
+    metrics = pool.metrics
+    lines = [
+        ("db_pool_checkouts_total", metrics.checkouts),
+        ("db_pool_in_use", metrics.in_use),
+        ("db_pool_checkout_wait_seconds_sum", round(metrics.wait_seconds_sum, 6)),
+        ("db_pool_checkout_wait_seconds_max", round(metrics.wait_seconds_max, 6)),
+        ("db_pool_overflow_total", metrics.overflows),
+        ("db_pool_timeouts_total", metrics.timeouts),
+        ("db_pool_size", pool.size()),
+        ("db_pool_overflow", max(pool.overflow(), 0)),
+    ]
+    return "".join(f"{name} {value}\n" for name, value in lines)
@@ -1,11 +1,19 @@
 import os
-from sqlalchemy import Column, String, Integer
+import threading
+import uuid
+from itertools import chain
+from sqlalchemy import DDL, Column, String, Integer, JSON, event, exc, select
+from sqlalchemy.dialects.postgresql import JSONB
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from .dbpool import engine_options
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+database_path = os.environ.get(
+    "DATABASE_URL",
+    "sqlite:///{}".format(os.path.join(project_dir, database_filename)))
 
 db = SQLAlchemy()
 
@@ -16,8 +24,10 @@ setup_db(app)
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
+    app.before_first_request(upgrade_db)
 
 '''
 db_drop_and_create_all()
@@ -38,17 +48,22 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, stored as native JSON (JSONB on Postgres) and parsed
+    # once when the row is loaded
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe =  Column(String(180), nullable=False)
+    recipe = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
 
     '''
     short()
         short form representation of the Drink model
+        the color/parts projection of the recipe is built once per instance
+        and rebuilt only when a new recipe is assigned
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
+        short_recipe = self.__dict__.get('_short_recipe')
+        if short_recipe is None:
+            short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in self.recipe]
+            self._short_recipe = short_recipe
         return {
             'id': self.id,
             'title': self.title,
@@ -63,7 +78,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
     '''
@@ -78,6 +93,7 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        menu_cache.current()
 
     '''
     delete()
@@ -90,6 +106,7 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        menu_cache.current()
 
     '''
     update()
@@ -102,6 +119,184 @@ class Drink(db.Model):
     '''
     def update(self):
         db.session.commit()
+        menu_cache.current()
 
     def __repr__(self):
-        return json.dumps(self.short())
\ No newline at end of file
+        return f'<Drink {self.id} {self.title!r}>'
+
+
+@event.listens_for(Drink.recipe, 'set')
+def _recipe_changed(drink, value, oldvalue, initiator):
+    drink.__dict__.pop('_short_recipe', None)
+
+
+# Indexes for browsing the menu (see browse.py), as (dialect, DDL) pairs. The
+# same statements create them along with the table and add them to databases
+# made before they existed.
+DRINK_INDEXES = (
+    ('sqlite', 'CREATE INDEX IF NOT EXISTS ix_drink_title_lower '
+               'ON drink (lower(title))'),
+    # Title prefixes are byte ranges, which only hold in the "C" collation;
+    # the index without it could not serve them.
+    ('postgresql', 'DROP INDEX IF EXISTS ix_drink_title_lower'),
+    ('postgresql', 'CREATE INDEX IF NOT EXISTS ix_drink_title_lower_c '
+                   'ON drink ((lower(title) COLLATE "C"))'),
+    ('postgresql', 'CREATE INDEX IF NOT EXISTS ix_drink_recipe '
+                   'ON drink USING gin (recipe jsonb_path_ops)'),
+)
+
+for dialect, statement in DRINK_INDEXES:
+    ddl = DDL(statement)
+    if dialect is not None:
+        ddl = ddl.execute_if(dialect=dialect)
+    event.listen(Drink.__table__, 'after_create', ddl)
+
+
+'''
+format_drink(view, id, title, recipe)
+    the short or long form of a drink from its column values, for listings
+    that are read without loading Drink objects
+'''
+def format_drink(view, id, title, recipe):
+    if view == 'short':
+        recipe = [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+    return {
+        'id': id,
+        'title': title,
+        'recipe': recipe
+    }
+
+
+'''
+MenuVersion
+    a single row identifying the current state of the menu
+    version is bumped in the same transaction as every flush that adds,
+    changes or removes a Drink, so all workers agree on it. generation is
+    drawn when the table is created, so a recreated database never repeats
+    a (generation, version) pair a client may have cached.
+'''
+class MenuVersion(db.Model):
+    __tablename__ = 'menu_version'
+    id = Column(Integer, primary_key=True)
+    generation = Column(String(32), nullable=False)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def insert_menu_version():
+    '''The statement that creates the menu version row in a new generation.'''
+    return MenuVersion.__table__.insert().values(
+        id=1, generation=uuid.uuid4().hex, version=0)
+
+
+@event.listens_for(MenuVersion.__table__, 'after_create')
+def _insert_menu_version(table, connection, **kw):
+    connection.execute(insert_menu_version())
+
+
+# Statements and helpers shared with the async app (src/asgi.py), which runs
+# them without a session.
+BUMP_MENU_VERSION = MenuVersion.__table__.update().values(
+    version=MenuVersion.__table__.c.version + 1)
+SELECT_MENU_VERSION = select([
+    MenuVersion.__table__.c.generation, MenuVersion.__table__.c.version])
+SELECT_MENU = select([
+    Drink.__table__.c.id, Drink.__table__.c.title, Drink.__table__.c.recipe
+]).order_by(Drink.__table__.c.id)
+
+
+def version_tag(generation, version):
+    return f'{generation}-{version}'
+
+
+def encode_menu(rows):
+    '''The encoded 'short' and 'long' listings of (id, title, recipe) rows.'''
+    return {
+        view: _encode_drinks([format_drink(view, *row) for row in rows])
+        for view in ('short', 'long')
+    }
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_menu_version(session, flush_context, instances):
+    changed = chain(
+        session.new, session.deleted,
+        (obj for obj in session.dirty if session.is_modified(obj)))
+    if any(isinstance(obj, Drink) for obj in changed):
+        session.execute(BUMP_MENU_VERSION)
+
+
+'''
+upgrade_db()
+    adds the tables and indexes introduced since the database was made
+'''
+def upgrade_db():
+    MenuVersion.__table__.create(db.engine, checkfirst=True)
+    if not db.engine.has_table(Drink.__table__.name):
+        return
+    with db.engine.begin() as connection:
+        for dialect, statement in DRINK_INDEXES:
+            if dialect in (None, connection.dialect.name):
+                connection.execute(statement)
+
+
+'''
+menu_version()
+    the current menu version as a string, e.g. for an ETag
+'''
+def menu_version():
+    row = db.session.execute(SELECT_MENU_VERSION).first()
+    if row is None:
+        # The row was deleted by hand; put it back in a new generation
+        # rather than failing every read.
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(insert_menu_version())
+        except exc.IntegrityError:
+            pass  # another worker put it back first
+        row = db.session.execute(SELECT_MENU_VERSION).first()
+    return version_tag(*row)
+
+
+'''
+MenuCache
+    encoded JSON bodies of the drink listings, keyed 'short' and 'long',
+    together with the menu version they were built for
+    Drink.insert(), update() and delete() rebuild them right after they
+    commit. A worker that finds the version moved on (another worker
+    changed the menu) rebuilds them on its next read. Reads of an
+    unchanged menu cost the single-row version query and never touch the
+    ORM.
+'''
+class MenuCache:
+    def __init__(self):
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        '''Returns (version, bodies), rebuilding the bodies if the menu changed.'''
+        entry = self._entry
+        if entry is not None and entry[0] == menu_version():
+            return entry
+        with self._lock:
+            # Readers that waited here find the bodies built by the first.
+            version = menu_version()
+            entry = self._entry
+            if entry is None or entry[0] != version:
+                entry = (version, self._encode())
+                self._entry = entry
+            return entry
+
+    def invalidate(self):
+        self._entry = None
+
+    def _encode(self):
+        # The version was read first, so these rows are at least as new.
+        return encode_menu(db.session.execute(SELECT_MENU).fetchall())
+
+
+def _encode_drinks(drinks):
+    return json.dumps({'drinks': drinks, 'success': True},
+                      separators=(',', ':')).encode()
+
+
+menu_cache = MenuCache()
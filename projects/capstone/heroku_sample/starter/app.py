@@ -1,6 +1,7 @@
 import os
-from flask import Flask
-from models import setup_db
+from flask import Flask, Response
+from models import setup_db, db
+from dbpool import metrics_text
 
 def create_app(test_config=None):
 
@@ -19,6 +20,10 @@ def create_app(test_config=None):
     def be_cool():
         return "Be cool, man, be coooool! You're almost a FSND grad!"
 
+    @app.route('/metrics')
+    def metrics():
+        return Response(metrics_text(db.engine), mimetype='text/plain')
+
     return app
 
 app = create_app()
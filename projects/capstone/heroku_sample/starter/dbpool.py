@@ -0,0 +1,131 @@
+"""Environment-driven SQLAlchemy engine options and connection pool metrics.
+
+``engine_options(database_uri)`` builds ``SQLALCHEMY_ENGINE_OPTIONS`` from:
+
+    DB_POOL_SIZE           connections kept open (default 5)
+    DB_MAX_OVERFLOW        extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT        seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE        seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING       test connections before use (default true)
+    DB_STATEMENT_TIMEOUT   statement timeout in ms (default off)
+
+The app runs on PostgreSQL (DATABASE_URL), so these options assume it.
+
+Each pool built from these options records how long its checkouts wait,
+how many of its connections are in use and how often it overflows or
+times out. ``metrics_text(engine)`` renders those numbers in the
+Prometheus text format.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.wait_seconds_sum = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflows = 0
+        self.timeouts = 0
+
+    def checked_out(self, seconds, overflowed):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_seconds_sum += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if overflowed:
+                self.overflows += 1
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout wait time, overflow and timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        # _overflow counts from -pool_size, so it only goes above zero once
+        # every pooled connection is out and an overflow one is opened.
+        overflow = max(self._overflow, 0)
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timed_out()
+            raise
+        self.metrics.checked_out(time.perf_counter() - start,
+                                 max(self._overflow, 0) > overflow)
+        return connection
+
+    def _do_return_conn(self, conn):
+        try:
+            super()._do_return_conn(conn)
+        finally:
+            self.metrics.checked_in()
+
+    def recreate(self):
+        # Engine.dispose() swaps in a new pool; keep counting where we were.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def engine_options(database_uri):
+    options = {
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+    )
+    statement_timeout = _env_int("DB_STATEMENT_TIMEOUT", 0)
+    if statement_timeout:
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={statement_timeout}"
+        }
+    return options
+
+
+def metrics_text(engine):
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return ""
+    metrics = pool.metrics
+    lines = [
+        ("db_pool_checkouts_total", metrics.checkouts),
+        ("db_pool_in_use", metrics.in_use),
+        ("db_pool_checkout_wait_seconds_sum", round(metrics.wait_seconds_sum, 6)),
+        ("db_pool_checkout_wait_seconds_max", round(metrics.wait_seconds_max, 6)),
+        ("db_pool_overflow_total", metrics.overflows),
+        ("db_pool_timeouts_total", metrics.timeouts),
+        ("db_pool_size", pool.size()),
+        ("db_pool_overflow", max(pool.overflow(), 0)),
+    ]
+    return "".join(f"{name} {value}\n" for name, value in lines)
@@ -2,6 +2,8 @@ from sqlalchemy import Column, String, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from dbpool import engine_options
+
 database_path = os.environ['DATABASE_URL']
 
 db = SQLAlchemy()
@@ -13,6 +15,7 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
     db.create_all()